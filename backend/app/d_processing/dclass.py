@@ -1,7 +1,7 @@
 from dataclasses import dataclass, field
 import datetime
 import numpy as np
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 from app.data.tables import ActivityType
 
 @dataclass
@@ -46,8 +46,38 @@ class StepEvent:
     to_idx: int 
     next_hs_idx: int 
 
-@dataclass
+def _cycle_column(name: str, kind: type) -> property:
+    def get(self):
+        return kind(getattr(self.table, name)[self.index])
+
+    def set(self, value):
+        getattr(self.table, name)[self.index] = value
+
+    return property(get, set)
+
 class GaitCycle:
+    # Lightweight view of one row of a GaitCycleTable; reads and writes go to the arrays
+    __slots__ = ('table', 'index')
+
+    def __init__(self, table: Optional['GaitCycleTable'] = None, index: int = 0, **fields):
+        # GaitCycle(hs_idx=..., to_idx=..., ...) still builds a standalone one-row cycle
+        if table is None:
+            fields.setdefault('duration', fields.pop('stride_time', 0.0))
+            fields.pop('stride_time', None)
+            table = GaitCycleTable(**{name: [value] for name, value in fields.items()})
+        self.table = table
+        self.index = index
+
+    hs_idx = _cycle_column('hs_idx', int)
+    to_idx = _cycle_column('to_idx', int)
+    next_hs_idx = _cycle_column('next_hs_idx', int)
+    ms_idx = _cycle_column('ms_idx', int)
+    duration = _cycle_column('duration', float)
+    stride_time = _cycle_column('duration', float)
+    stance_time = _cycle_column('stance_time', float)
+    swing_time = _cycle_column('swing_time', float)
+    cadence = _cycle_column('cadence', float)
+
     def to_dict(self) -> Dict:
         return {
             'hs': self.hs_idx,
@@ -61,6 +91,87 @@ class GaitCycle:
             'cadence': self.cadence
         }
 
+    def __repr__(self):
+        return f"GaitCycle({self.to_dict()})"
+
+class GaitCycleTable:
+    # Gait cycles as parallel arrays, one position per stride: event sample
+    # indices as int64, times in seconds and cadence in steps/min as float64
+    INDEX_FIELDS = ('hs_idx', 'to_idx', 'next_hs_idx', 'ms_idx')
+    VALUE_FIELDS = ('duration', 'stance_time', 'swing_time', 'cadence')
+    __slots__ = INDEX_FIELDS + VALUE_FIELDS
+
+    def __init__(
+        self,
+        hs_idx=(),
+        to_idx=(),
+        next_hs_idx=(),
+        ms_idx=(),
+        duration=(),
+        stance_time=(),
+        swing_time=(),
+        cadence=()
+    ):
+        for name, values in zip(self.INDEX_FIELDS, (hs_idx, to_idx, next_hs_idx, ms_idx)):
+            setattr(self, name, np.asarray(values, dtype=np.int64))
+        for name, values in zip(self.VALUE_FIELDS, (duration, stance_time, swing_time, cadence)):
+            setattr(self, name, np.asarray(values, dtype=float))
+
+    @property
+    def stride_time(self) -> np.ndarray:
+        return self.duration
+
+    @classmethod
+    def from_cycles(cls, cycles) -> 'GaitCycleTable':
+        if isinstance(cycles, cls):
+            return cycles
+        cycles = list(cycles)
+        return cls(**{
+            name: [getattr(c, name) for c in cycles]
+            for name in cls.INDEX_FIELDS + cls.VALUE_FIELDS
+        })
+
+    @classmethod
+    def concatenate(cls, tables) -> 'GaitCycleTable':
+        tables = list(tables)
+        if not tables:
+            return cls()
+        return cls(**{
+            name: np.concatenate([getattr(t, name) for t in tables])
+            for name in cls.INDEX_FIELDS + cls.VALUE_FIELDS
+        })
+
+    def shift(self, offset: int) -> 'GaitCycleTable':
+        # Same strides with every event index moved by offset samples
+        columns = {name: getattr(self, name) + offset for name in self.INDEX_FIELDS}
+        columns.update({name: getattr(self, name) for name in self.VALUE_FIELDS})
+        return GaitCycleTable(**columns)
+
+    def to_dicts(self) -> List[Dict]:
+        return [cycle.to_dict() for cycle in self]
+
+    def __len__(self):
+        return len(self.hs_idx)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield GaitCycle(self, i)
+
+    def __getitem__(self, item):
+        if isinstance(item, (int, np.integer)):
+            if item < 0:
+                item += len(self)
+            if not 0 <= item < len(self):
+                raise IndexError("GaitCycleTable index out of range")
+            return GaitCycle(self, int(item))
+        return GaitCycleTable(**{
+            name: getattr(self, name)[item]
+            for name in self.INDEX_FIELDS + self.VALUE_FIELDS
+        })
+
+    def __repr__(self):
+        return f"GaitCycleTable(n_cycles={len(self)})"
+
 @dataclass
 class DetectorConfig:
     sampling_rate: int = 125
@@ -91,6 +202,8 @@ class FilterConfig:
     transition_duration: float = 0.5  
     transition_type: str = "cosine"  
     sampling_rate: int = 125 
+    causal: bool = False  # single forward pass with carried state instead of sosfiltfilt
+    compensate_delay: bool = False  # advance causal output by its group delay
     
     def __post_init__(self):
         if self.cutoff_frequencies is None:
@@ -123,6 +236,12 @@ class ActivityFeatures:
     peak_count_shank: int 
     vertical_variance: float 
 
+# One row per analysis window, same columns as ActivityFeatures
+ACTIVITY_FEATURES_DTYPE = np.dtype([
+    (name, 'i4' if kind is int else 'f8')
+    for name, kind in ActivityFeatures.__annotations__.items()
+])
+
 @dataclass
 class DetectionConfig:
     window_size: float = 2.0  
@@ -153,6 +272,7 @@ class DetectionConfig:
     
     freq_band_low: float = 0.5  
     freq_band_high: float = 5.0 
+    spectral_method: str = "fft"  # "fft" or "sliding" (running band-bin DFT, periodic Hann)
 
 @dataclass
 class ActivitySegment:
@@ -160,4 +280,4 @@ class ActivitySegment:
     start_time: float 
     end_time: float  
     confidence: float  
-    features: Optional[ActivityFeatures] = None
\ No newline at end of file
+    features: Optional[np.void] = None  # row of the window feature table
\ No newline at end of file
@@ -2,192 +2,143 @@ import numpy as np
 from dataclasses import dataclass, asdict, is_dataclass
 from enum import Enum
 from typing import List, Tuple, Dict, Optional, Any
-from scipy import signal
 from datetime import datetime
-from .dclass import ActivityFeatures, ActivitySegment, DetectionConfig
+from .dclass import ActivitySegment, DetectionConfig, ActivityType
+from .window_features import WindowFeatureEngine
 
-class ActivityType(Enum):
-    STANDING = "standing"
-    WALKING = "walking"
-    RUNNING = "running"
-    JUMPING = "jumping"
-    STAIRS = "stairs"
-    UNKNOWN = "unknown"
+# Integer codes used by the vectorized classifier index into this list
+ACTIVITY_CLASSES = list(ActivityType)
 
 class ActivityDetector:
     def __init__(self, config: Optional[DetectionConfig] = None):
         self.config = config if config is not None else DetectionConfig()
+        self._spectral_cache = {}
         
     def detect(self, data: np.ndarray) -> List[ActivitySegment]:
+        start_times, end_times, table = self.window_engine().push(data)
+        activity_codes, confidence = self._classify(table)
+        return self._merge_runs(start_times, end_times, activity_codes, confidence, table)
+
+    def detect_windows(self, data: np.ndarray) -> List[ActivitySegment]:
+        return self.window_segments(*self.window_engine().push(data))
+
+    def window_engine(self) -> WindowFeatureEngine:
+        # Carries running sums between calls; push() consecutive pieces of one
+        # recording to get the same windows as a single detect_windows call
         window_samples = int(self.config.window_size * self.config.sampling_rate)
-        step_samples = int((self.config.window_size - self.config.window_overlap) * 
-                          self.config.sampling_rate)
-        
-        segments = []
-        n_samples = len(data)
-        
-        for start_idx in range(0, n_samples - window_samples + 1, step_samples):
-            end_idx = start_idx + window_samples
-            window_data = data[start_idx:end_idx]
-            
-            features = self._extract_features(window_data)
-            
-            activity_type, confidence = self._classify(features)
-            
-            segment = ActivitySegment(
-                activity_type=activity_type,
-                start_time=window_data['timestamp'][0],
-                end_time=window_data['timestamp'][-1],
-                confidence=confidence,
-                features=features
+        return WindowFeatureEngine(self.config, self._spectral_plan(window_samples))
+
+    def window_segments(
+        self,
+        start_times: np.ndarray,
+        end_times: np.ndarray,
+        table: np.ndarray
+    ) -> List[ActivitySegment]:
+        activity_codes, confidence = self._classify(table)
+        return [
+            ActivitySegment(
+                activity_type=ACTIVITY_CLASSES[code],
+                start_time=start_time,
+                end_time=end_time,
+                confidence=float(conf),
+                features=row
             )
-            segments.append(segment)
-        
-        merged_segments = self._merge_segments(segments)
-        
-        return merged_segments
+            for start_time, end_time, code, conf, row in zip(start_times, end_times, activity_codes, confidence, table)
+        ]
     
-    def _extract_features(self, window_data: np.ndarray) -> ActivityFeatures:
-        acc_thigh = window_data['acc1']
-        acc_shank = window_data['acc2']  
-        
-        mag_thigh = np.sqrt(np.sum(acc_thigh**2, axis=1))  
-        mag_shank = np.sqrt(np.sum(acc_shank**2, axis=1))  
-        
-        sma_thigh = np.mean(np.sum(np.abs(acc_thigh), axis=1))
-        sma_shank = np.mean(np.sum(np.abs(acc_shank), axis=1))
-        
-        mag_mean_thigh = np.mean(mag_thigh)
-        mag_mean_shank = np.mean(mag_shank)
-        mag_std_thigh = np.std(mag_thigh)
-        mag_std_shank = np.std(mag_shank)
-        
-        mag_ratio = mag_mean_shank / (mag_mean_thigh + 1e-6)
-        
-        window = np.hanning(len(mag_shank))
-        
-        fft_shank = np.fft.rfft(mag_shank * window)
-        freqs = np.fft.rfftfreq(len(mag_shank), 1.0 / self.config.sampling_rate)
-        
-        freq_mask = (freqs >= self.config.freq_band_low) & (freqs <= self.config.freq_band_high)
-        power_spectrum = np.abs(fft_shank[freq_mask])**2
-        freqs_filtered = freqs[freq_mask]
-        
-        spectral_energy_shank = np.sum(power_spectrum)
-        
-        if len(power_spectrum) > 0:
-            dominant_idx = np.argmax(power_spectrum)
-            dominant_freq_shank = freqs_filtered[dominant_idx]
-        else:
-            dominant_freq_shank = 0.0
-        
-        cadence = dominant_freq_shank * 60 * 2
-        
-        fft_thigh = np.fft.rfft(mag_thigh * window)
-        power_spectrum_thigh = np.abs(fft_thigh[freq_mask])**2
-        spectral_energy_thigh = np.sum(power_spectrum_thigh)
-        
-        if len(power_spectrum_thigh) > 0:
-            dominant_idx_thigh = np.argmax(power_spectrum_thigh)
-            dominant_freq_thigh = freqs_filtered[dominant_idx_thigh]
-        else:
-            dominant_freq_thigh = 0.0
-        
-        peaks, _ = signal.find_peaks(
-            mag_shank,
-            height=self.config.jumping_peak_threshold * 9.81,  
-            distance=int(self.config.sampling_rate * 0.2) 
-        )
-        peak_count_shank = len(peaks)
-        
-        vertical_variance = np.var(acc_shank[:, 2])
-        
-        return ActivityFeatures(
-            sma_thigh=float(sma_thigh),
-            sma_shank=float(sma_shank),
-            mag_mean_thigh=float(mag_mean_thigh),
-            mag_mean_shank=float(mag_mean_shank),
-            mag_std_thigh=float(mag_std_thigh),
-            mag_std_shank=float(mag_std_shank),
-            mag_ratio=float(mag_ratio),
-            cadence=float(cadence),
-            spectral_energy_thigh=float(spectral_energy_thigh),
-            spectral_energy_shank=float(spectral_energy_shank),
-            dominant_freq_thigh=float(dominant_freq_thigh),
-            dominant_freq_shank=float(dominant_freq_shank),
-            peak_count_shank=int(peak_count_shank),
-            vertical_variance=float(vertical_variance)
-        )
+    def _spectral_plan(self, window_samples: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # Hanning taper and analysis band depend only on the config, not on the data
+        key = (window_samples, self.config.sampling_rate,
+               self.config.freq_band_low, self.config.freq_band_high)
+        if key not in self._spectral_cache:
+            window = np.hanning(window_samples)
+            freqs = np.fft.rfftfreq(window_samples, 1.0 / self.config.sampling_rate)
+            freq_mask = (freqs >= self.config.freq_band_low) & (freqs <= self.config.freq_band_high)
+            self._spectral_cache[key] = (window, freq_mask, freqs[freq_mask])
+        return self._spectral_cache[key]
     
-    def _classify(self, features: ActivityFeatures) -> Tuple[ActivityType, float]:
+    def _classify(self, table: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # Rules are checked in priority order; np.select keeps the first that matches
         cfg = self.config
-        if (features.peak_count_shank >= cfg.jumping_peak_count_min and
-            features.vertical_variance >= cfg.jumping_vertical_var_min and
-            features.mag_std_shank > cfg.standing_std_max * 3):
-            
-            confidence = min(
-                features.vertical_variance / (cfg.jumping_vertical_var_min * 2),
-                1.0
-            )
-            return ActivityType.JUMPING, confidence
-        
-        if (features.sma_shank <= cfg.standing_sma_max and
-            features.mag_std_shank <= cfg.standing_std_max):
-            
-            confidence = 1.0 - (features.sma_shank / cfg.standing_sma_max)
-            return ActivityType.STANDING, confidence
-        
-        if (features.sma_shank >= cfg.running_sma_min and
-            features.cadence >= cfg.running_cadence_min and
-            features.spectral_energy_shank >= cfg.running_energy_min):
-            
-            confidence = min(
-                (features.spectral_energy_shank / cfg.running_energy_min) * 0.5 +
-                (features.cadence / (cfg.running_cadence_min * 1.5)) * 0.5,
-                1.0
-            )
-            return ActivityType.RUNNING, confidence
-        
-        if (features.mag_ratio >= cfg.stairs_mag_ratio_min and
-            cfg.stairs_cadence_min <= features.cadence <= cfg.stairs_cadence_max and
-            features.sma_shank >= cfg.stairs_sma_min):
-            
-            confidence = min(
-                (features.mag_ratio - 1.0) * 0.5 + 0.5,
+        sma = table['sma_shank']
+        std = table['mag_std_shank']
+        cadence = table['cadence']
+        energy = table['spectral_energy_shank']
+        vertical_variance = table['vertical_variance']
+        mag_ratio = table['mag_ratio']
+        
+        jumping = ((table['peak_count_shank'] >= cfg.jumping_peak_count_min) &
+                   (vertical_variance >= cfg.jumping_vertical_var_min) &
+                   (std > cfg.standing_std_max * 3))
+        standing = (sma <= cfg.standing_sma_max) & (std <= cfg.standing_std_max)
+        running = ((sma >= cfg.running_sma_min) &
+                   (cadence >= cfg.running_cadence_min) &
+                   (energy >= cfg.running_energy_min))
+        stairs = ((mag_ratio >= cfg.stairs_mag_ratio_min) &
+                  (cadence >= cfg.stairs_cadence_min) & (cadence <= cfg.stairs_cadence_max) &
+                  (sma >= cfg.stairs_sma_min))
+        walking = ((sma >= cfg.walking_sma_min) & (sma <= cfg.walking_sma_max) &
+                   (cadence >= cfg.walking_cadence_min) & (cadence <= cfg.walking_cadence_max) &
+                   (energy < cfg.walking_energy_max))
+        
+        cadence_center = (cfg.walking_cadence_min + cfg.walking_cadence_max) / 2
+        cadence_range = cfg.walking_cadence_max - cfg.walking_cadence_min
+        cadence_score = 1.0 - np.abs(cadence - cadence_center) / cadence_range
+        
+        conditions = [jumping, standing, running, stairs, walking]
+        activity_codes = np.select(conditions, [ACTIVITY_CLASSES.index(a) for a in (
+            ActivityType.JUMPING, ActivityType.STANDING, ActivityType.RUNNING,
+            ActivityType.STAIRS, ActivityType.WALKING
+        )], default=ACTIVITY_CLASSES.index(ActivityType.UNKNOWN))
+        confidence = np.select(conditions, [
+            np.minimum(vertical_variance / (cfg.jumping_vertical_var_min * 2), 1.0),
+            1.0 - (sma / cfg.standing_sma_max),
+            np.minimum(
+                (energy / cfg.running_energy_min) * 0.5 +
+                (cadence / (cfg.running_cadence_min * 1.5)) * 0.5,
                 1.0
-            )
-            return ActivityType.STAIRS, confidence
-        
-        if (cfg.walking_sma_min <= features.sma_shank <= cfg.walking_sma_max and
-            cfg.walking_cadence_min <= features.cadence <= cfg.walking_cadence_max and
-            features.spectral_energy_shank < cfg.walking_energy_max):
-            
-            cadence_center = (cfg.walking_cadence_min + cfg.walking_cadence_max) / 2
-            cadence_range = cfg.walking_cadence_max - cfg.walking_cadence_min
-            cadence_score = 1.0 - abs(features.cadence - cadence_center) / cadence_range
-            
-            confidence = max(0.5, cadence_score)
-            return ActivityType.WALKING, confidence
-        
-        return ActivityType.UNKNOWN, 0.3
+            ),
+            np.minimum((mag_ratio - 1.0) * 0.5 + 0.5, 1.0),
+            np.maximum(0.5, cadence_score)
+        ], default=0.3)
+        return activity_codes, confidence
     
     def _merge_segments(self, segments: List[ActivitySegment]) -> List[ActivitySegment]:
         if len(segments) == 0:
             return []
-        
-        merged = []
-        current = segments[0]
-        
-        for next_segment in segments[1:]:
-            if current.activity_type == next_segment.activity_type:
-                current.end_time = next_segment.end_time
-                current.confidence = (current.confidence + next_segment.confidence) / 2
-            else:
-                merged.append(current)
-                current = next_segment
-        merged.append(current)
-        
-        return merged
+        return self._merge_runs(
+            np.array([seg.start_time for seg in segments]),
+            np.array([seg.end_time for seg in segments]),
+            np.array([ACTIVITY_CLASSES.index(seg.activity_type) for seg in segments]),
+            np.array([seg.confidence for seg in segments], dtype=float),
+            [seg.features for seg in segments]
+        )
+    
+    @staticmethod
+    def _merge_runs(start_times, end_times, activity_codes, confidence, features) -> List[ActivitySegment]:
+        # Consecutive windows of one activity collapse into a segment that keeps the
+        # first window's features and the running pairwise mean of the confidences,
+        # i.e. c_j weighted by 2^-(run_end - j) with the first window counted twice
+        if len(activity_codes) == 0:
+            return []
+        run_starts = np.flatnonzero(np.r_[True, activity_codes[1:] != activity_codes[:-1]])
+        run_ends = np.r_[run_starts[1:], len(activity_codes)]
+        
+        index = np.arange(len(activity_codes))
+        weights = np.exp2(index - np.repeat(run_ends, np.diff(np.r_[run_starts, len(index)])))
+        weights[run_starts] *= 2
+        run_confidence = np.add.reduceat(confidence * weights, run_starts)
+        
+        return [
+            ActivitySegment(
+                activity_type=ACTIVITY_CLASSES[activity_codes[s]],
+                start_time=start_times[s],
+                end_time=end_times[e - 1],
+                confidence=float(c),
+                features=features[s]
+            )
+            for s, e, c in zip(run_starts, run_ends, run_confidence)
+        ]
     
     def get_activity_summary(self, segments: List[ActivitySegment]) -> Dict[str, float]:
         summary = {activity.value: 0.0 for activity in ActivityType}
@@ -203,7 +154,9 @@ def jsonb(segments: List[Any]) -> List[dict]:
     
     for seg in segments:
         features_data = {}
-        if is_dataclass(seg.features):
+        if isinstance(seg.features, np.void):
+            features_data = {name: seg.features[name].item() for name in seg.features.dtype.names}
+        elif is_dataclass(seg.features):
             features_data = asdict(seg.features)
         elif isinstance(seg.features, dict):
             features_data = seg.features
@@ -0,0 +1,194 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import select, insert, update, func, and_, or_
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from app.data.tables import ProcessingJobs, JobStatus, WalkingSessions, SessionStatus
+from .progress import refresh_user_progress
+
+# Statements go through the table, not the mapped class, so workers never
+# need the rest of the ORM configured
+jobs = ProcessingJobs.__table__
+sessions = WalkingSessions.__table__
+
+class JobQueue:
+    # Durable processing queue on the processing_jobs table. A worker claims a
+    # job by taking a lease on it; a job whose lease runs out (worker crashed or
+    # was stopped) becomes claimable again, and failures are retried with a
+    # growing delay until max_attempts is used up. Claims are a compare-and-set
+    # UPDATE, so any number of workers on any machines can share one table.
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        lease_seconds: float = 300.0,
+        retry_delay: float = 30.0,
+        max_attempts: int = 3
+    ):
+        self.session_factory = session_factory
+        self.lease_seconds = lease_seconds
+        self.retry_delay = retry_delay
+        self.max_attempts = max_attempts
+
+    @staticmethod
+    def _now() -> datetime:
+        return datetime.now(timezone.utc)
+
+    async def enqueue(self, db: AsyncSession, session_id: int, raw_path: str) -> int:
+        # Runs in the caller's transaction, so the job exists iff the upload commits
+        now = self._now()
+        result = await db.execute(
+            insert(jobs).values(
+                session_id=session_id,
+                raw_path=raw_path,
+                status=JobStatus.QUEUED,
+                attempts=0,
+                max_attempts=self.max_attempts,
+                run_after=now,
+                created_at=now,
+                updated_at=now
+            )
+        )
+        return result.inserted_primary_key[0]
+
+    async def depth(self, db: Optional[AsyncSession] = None) -> int:
+        # Jobs waiting or running
+        query = select(func.count()).select_from(jobs).where(
+            jobs.c.status.in_([JobStatus.QUEUED, JobStatus.RUNNING])
+        )
+        if db is not None:
+            return int((await db.execute(query)).scalar_one())
+        async with self.session_factory() as db:
+            return int((await db.execute(query)).scalar_one())
+
+    def _claimable(self, now: datetime):
+        return or_(
+            and_(jobs.c.status == JobStatus.QUEUED, jobs.c.run_after <= now),
+            and_(
+                jobs.c.status == JobStatus.RUNNING,
+                jobs.c.lease_expires_at < now,
+                jobs.c.attempts < jobs.c.max_attempts
+            )
+        )
+
+    async def claim(self, worker_id: str) -> Optional[Row]:
+        now = self._now()
+        async with self.session_factory() as db:
+            # Expired leases with no attempts left are given up on
+            expired = (await db.execute(
+                update(jobs)
+                .where(
+                    jobs.c.status == JobStatus.RUNNING,
+                    jobs.c.lease_expires_at < now,
+                    jobs.c.attempts >= jobs.c.max_attempts
+                )
+                .values(status=JobStatus.FAILED, last_error="Lease expired", lease_owner=None, updated_at=now)
+                .returning(jobs.c.session_id)
+            )).scalars().all()
+            await self._stop_sessions(db, expired)
+
+            # SKIP LOCKED keeps concurrent Postgres workers off the same row;
+            # the conditional UPDATE below is what actually decides the claim
+            candidate = (await db.execute(
+                select(jobs.c.id)
+                .where(self._claimable(now))
+                .order_by(jobs.c.run_after, jobs.c.id)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            )).scalar_one_or_none()
+            if candidate is None:
+                await db.commit()
+                return None
+
+            result = await db.execute(
+                update(jobs)
+                .where(jobs.c.id == candidate, self._claimable(now))
+                .values(
+                    status=JobStatus.RUNNING,
+                    attempts=jobs.c.attempts + 1,
+                    lease_owner=worker_id,
+                    lease_expires_at=now + timedelta(seconds=self.lease_seconds),
+                    updated_at=now
+                )
+            )
+            await db.commit()
+            if result.rowcount != 1:
+                return None
+            return (await db.execute(select(jobs).where(jobs.c.id == candidate))).one()
+
+    async def heartbeat(self, job_id: int, worker_id: str) -> bool:
+        # Renews the lease; False means the job is no longer ours
+        now = self._now()
+        async with self.session_factory() as db:
+            result = await db.execute(
+                update(jobs)
+                .where(
+                    jobs.c.id == job_id,
+                    jobs.c.status == JobStatus.RUNNING,
+                    jobs.c.lease_owner == worker_id
+                )
+                .values(lease_expires_at=now + timedelta(seconds=self.lease_seconds), updated_at=now)
+            )
+            await db.commit()
+            return result.rowcount == 1
+
+    async def complete(self, job_id: int, worker_id: str, db: Optional[AsyncSession] = None) -> bool:
+        # With db, runs in the caller's transaction: False means the lease is gone
+        # and the caller should roll back whatever it wrote for the job
+        return await self._finish(job_id, worker_id, db=db, status=JobStatus.DONE, last_error=None)
+
+    async def fail(self, job_id: int, worker_id: str, error: str, retry: bool = True) -> bool:
+        # Back to the queue after retry_delay * 2^(attempts - 1), or FAILED for good
+        now = self._now()
+        async with self.session_factory() as db:
+            job = (await db.execute(select(jobs).where(jobs.c.id == job_id))).one_or_none()
+        if job is None:
+            return False
+        if retry and job.attempts < job.max_attempts:
+            delay = self.retry_delay * 2 ** max(job.attempts - 1, 0)
+            return await self._finish(
+                job_id, worker_id, status=JobStatus.QUEUED, last_error=error,
+                run_after=now + timedelta(seconds=delay)
+            )
+        return await self._finish(job_id, worker_id, give_up=True, status=JobStatus.FAILED, last_error=error)
+
+    async def _finish(
+        self,
+        job_id: int,
+        worker_id: str,
+        give_up: bool = False,
+        db: Optional[AsyncSession] = None,
+        **values
+    ) -> bool:
+        if db is None:
+            async with self.session_factory() as db:
+                finished = await self._finish(job_id, worker_id, give_up, db, **values)
+                await db.commit()
+                return finished
+
+        session_id = (await db.execute(
+            update(jobs)
+            .where(
+                jobs.c.id == job_id,
+                jobs.c.status == JobStatus.RUNNING,
+                jobs.c.lease_owner == worker_id
+            )
+            .values(lease_owner=None, lease_expires_at=None, updated_at=self._now(), **values)
+            .returning(jobs.c.session_id)
+        )).scalar_one_or_none()
+        if session_id is not None and give_up:
+            await self._stop_sessions(db, [session_id])
+        return session_id is not None
+
+    async def _stop_sessions(self, db: AsyncSession, session_ids):
+        # Sessions whose job failed for good leave PROCESSING for STOPPED, so they
+        # can be reprocessed, and drop out of the user's rollups
+        if not session_ids:
+            return
+        stopped = (await db.execute(
+            update(sessions)
+            .where(sessions.c.id.in_(session_ids), sessions.c.status == SessionStatus.PROCESSING)
+            .values(status=SessionStatus.STOPPED, is_processed=False)
+            .returning(sessions.c.user_id, sessions.c.start_time)
+        )).all()
+        for user_id, start_time in stopped:
+            await refresh_user_progress(db, user_id, start_time)
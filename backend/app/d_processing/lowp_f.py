@@ -6,20 +6,106 @@ from scipy import signal
 from enum import Enum
 from .detect_act import ActivityType
 from .dclass import ActivitySegment, FilterConfig
+from .unpacking import SENSOR_FIELDS
+
+def prefiltration(
+    data: np.ndarray,
+    cutoff: float = 20.0,
+    fs: float = 125.0,
+    causal: bool = False,
+    state: Optional['CausalFilter'] = None,
+    compensate_delay: bool = False
+):
+    # causal=True runs a single forward pass; pass the same `state` for consecutive
+    # pieces of one recording so the delay line carries over between calls
+    if causal or state is not None:
+        lowpass = state if state is not None else CausalFilter(cutoff, fs=fs)
+        filtered = lowpass.process(data)
+        return lowpass.advance(filtered) if compensate_delay else filtered
 
-def prefiltration(data: np.ndarray, cutoff: float = 20.0, fs: float = 125.0): 
     order = 4  
     nyq = 0.5 * fs
     normal_cutoff = cutoff / nyq
     if normal_cutoff >= 1.0:
             normal_cutoff = 0.99
     b, a = butter(order, normal_cutoff, btype='lowpass')
-    return filtfilt(b, a, data, axis=0)
+    if data.dtype.names is None:
+        return filtfilt(b, a, data, axis=0)
+
+    filtered = np.copy(data)
+    for field in SENSOR_FIELDS:
+        filtered[field] = filtfilt(b, a, data[field], axis=0)
+    return filtered
+
+class CausalFilter:
+    # Single-pass Butterworth low-pass whose delay line (zi) survives between calls,
+    # so a signal fed in pieces is filtered exactly as if it arrived at once.
+    def __init__(self, cutoff: float, fs: float = 125.0, order: int = 4):
+        nyquist_freq = fs / 2.0
+        if cutoff >= nyquist_freq:
+            cutoff = nyquist_freq * 0.95
+        self.fs = fs
+        self.sos = signal.butter(order, cutoff, btype='low', fs=fs, output='sos')
+        self.zi = None
+
+        # Low-frequency group delay in samples; the sections are in cascade, so
+        # their delays add up. Gait content sits well inside the passband.
+        self.group_delay = float(sum(
+            signal.group_delay((section[:3], section[3:]), w=[0.0])[1][0]
+            for section in self.sos
+        ))
+
+    @property
+    def delay_seconds(self) -> float:
+        return self.group_delay / self.fs
+
+    def reset(self):
+        self.zi = None
+
+    def process(self, x: np.ndarray) -> np.ndarray:
+        if x.dtype.names is not None:
+            # Structured records: all sensor axes go through one (N, 12) pass
+            channels = np.concatenate([x[field] for field in SENSOR_FIELDS], axis=1)
+            smoothed = self.process(channels)
+            filtered = np.copy(x)
+            for k, field in enumerate(SENSOR_FIELDS):
+                filtered[field] = smoothed[:, 3 * k:3 * k + 3]
+            return filtered
+
+        x = np.asarray(x, dtype=float)
+        if len(x) == 0:
+            return x.copy()
+        if self.zi is None:
+            # Steady state for the first sample avoids a start-up transient
+            zi = signal.sosfilt_zi(self.sos)
+            self.zi = zi.reshape(zi.shape + (1,) * (x.ndim - 1)) * x[0]
+        y, self.zi = signal.sosfilt(self.sos, x, axis=0, zi=self.zi)
+        return y
+
+    def advance(self, y: np.ndarray) -> np.ndarray:
+        # Shift a complete causal output back by the rounded group delay so it
+        # lines up with the input samples; the last samples repeat the final value.
+        # Incremental callers should re-time events by delay_seconds instead.
+        shift = int(round(self.group_delay))
+        if shift == 0 or len(y) == 0:
+            return y
+        shift = min(shift, len(y) - 1)
+        if y.dtype.names is not None:
+            advanced = np.copy(y)
+            for field in SENSOR_FIELDS:
+                advanced[field] = self.advance(y[field])
+            return advanced
+        return np.concatenate([y[shift:], np.repeat(y[-1:], shift, axis=0)], axis=0)
 
 class Filter:
     def __init__(self, config: Optional[FilterConfig] = None):
         self.config = config if config is not None else FilterConfig()
         self._filter_cache = {}  
+        self._causal_states = {}
+        
+    def reset(self):
+        # Forget the carried filter state before starting a new recording
+        self._causal_states = {}
         
     def process(
         self, 
@@ -29,68 +115,98 @@ class Filter:
         if len(data) == 0:
             return data
         
-        filtered_data = np.copy(data)
         timestamps = data['timestamp']
-        unique_activities = set(seg.activity_type for seg in segments)
-        filtered_versions = {}
-        
-        for activity_type in unique_activities:
-            cutoff_freq = self.config.cutoff_frequencies[activity_type]
-            filtered_versions[activity_type] = self._apply_butterworth_filter(
-                data, cutoff_freq
-            )
+        # First-appearance order keeps the blend, and its rounding, reproducible
+        unique_activities = list(dict.fromkeys(seg.activity_type for seg in segments))
         alpha_masks = self._create_alpha_masks(timestamps, segments, unique_activities)
-        for field in ['acc1', 'gyro1', 'acc2', 'gyro2']:
-            blended = np.zeros_like(data[field])
-            
-            for activity_type in unique_activities:
-                alpha = alpha_masks[activity_type]  
-                filtered_version = filtered_versions[activity_type][field]
-                
-                blended += filtered_version * alpha[:, np.newaxis]
-            
-            filtered_data[field] = blended
-        
+
+        # Activities sharing a cutoff share one filter and a combined weight
+        bank = {}
+        for activity_type in unique_activities:
+            filter_key = self._cutoff_key(self.config.cutoff_frequencies[activity_type])
+            alpha = alpha_masks[activity_type]
+            bank[filter_key] = bank[filter_key] + alpha if filter_key in bank else alpha
+        if self.config.causal:
+            # A cutoff skipped by this call would resume from a stale delay line
+            self._causal_states = {k: v for k, v in self._causal_states.items() if k in bank}
+
+        channels = np.concatenate([data[field] for field in SENSOR_FIELDS], axis=1).astype(float)
+        blended = np.zeros_like(channels)
+        for filter_key, alpha in bank.items():
+            if self.config.causal:
+                # The carried delay line has to see every sample of the chunk
+                blended += self._apply_causal_filter(channels, filter_key) * alpha[:, np.newaxis]
+                continue
+
+            # Only the stretches this cutoff contributes to are filtered, each with
+            # enough margin on both sides for the edge transient to die out
+            sos, pad = self._get_filter(filter_key)
+            for start, end in self._active_ranges(alpha, pad):
+                lo, hi = max(start - pad, 0), min(end + pad, len(channels))
+                filtered = self._apply_butterworth_filter(channels[lo:hi], sos)
+                blended[start:end] += filtered[start - lo:end - lo] * alpha[start:end, np.newaxis]
+
+        filtered_data = np.copy(data)
+        for k, field in enumerate(SENSOR_FIELDS):
+            filtered_data[field] = blended[:, 3 * k:3 * k + 3]
         return filtered_data
     
-    def _apply_butterworth_filter(
-        self, 
-        data: np.ndarray, 
-        cutoff_freq: float
-    ) -> np.ndarray:
-        nyquist_freq = self.config.sampling_rate / 2.0
-        if cutoff_freq >= nyquist_freq:
-            cutoff_freq = nyquist_freq * 0.95 
-        
-        filter_key = (cutoff_freq, self.config.filter_order)
+    def _get_filter(self, filter_key):
         if filter_key not in self._filter_cache:
+            cutoff_freq, order = filter_key
             sos = signal.butter(
-                self.config.filter_order,
+                order,
                 cutoff_freq,
                 btype='low',
                 fs=self.config.sampling_rate,
                 output='sos' 
             )
-            self._filter_cache[filter_key] = sos
-        else:
-            sos = self._filter_cache[filter_key]
-        
-        filtered = np.copy(data)
-        
-        for field in ['acc1', 'gyro1', 'acc2', 'gyro2']:
-            filtered[field] = signal.sosfiltfilt(
-                sos, 
-                data[field], 
-                axis=0  
+            # Margin = samples until the impulse response has decayed below 1e-4 of its peak
+            n = int(20 * self.config.sampling_rate / cutoff_freq) + 1
+            impulse = np.zeros(n)
+            impulse[0] = 1.0
+            response = np.abs(signal.sosfilt(sos, impulse))
+            pad = int(np.flatnonzero(response > 1e-4 * response.max())[-1]) + 1
+            self._filter_cache[filter_key] = (sos, pad)
+        return self._filter_cache[filter_key]
+
+    def _apply_butterworth_filter(self, x: np.ndarray, sos: np.ndarray) -> np.ndarray:
+        # sosfiltfilt's default edge padding, shortened for ranges near the session ends
+        padlen = min(3 * (2 * len(sos) + 1), len(x) - 1)
+        return signal.sosfiltfilt(sos, x, axis=0, padlen=padlen)
+
+    def _apply_causal_filter(self, x: np.ndarray, filter_key) -> np.ndarray:
+        if filter_key not in self._causal_states:
+            cutoff_freq, order = filter_key
+            self._causal_states[filter_key] = CausalFilter(
+                cutoff_freq, fs=self.config.sampling_rate, order=order
             )
-        
-        return filtered
-    
+        lowpass = self._causal_states[filter_key]
+        filtered = lowpass.process(x)
+        return lowpass.advance(filtered) if self.config.compensate_delay else filtered
+
+    @staticmethod
+    def _active_ranges(alpha: np.ndarray, pad: int):
+        # Runs of non-zero weight; runs closer than two margins are filtered together
+        active = np.flatnonzero(alpha > 0)
+        if len(active) == 0:
+            return []
+        breaks = np.flatnonzero(np.diff(active) > 2 * pad + 1)
+        starts = np.concatenate([active[:1], active[breaks + 1]])
+        ends = np.concatenate([active[breaks], active[-1:]]) + 1
+        return zip(starts, ends)
+
+    def _cutoff_key(self, cutoff_freq: float):
+        nyquist_freq = self.config.sampling_rate / 2.0
+        if cutoff_freq >= nyquist_freq:
+            cutoff_freq = nyquist_freq * 0.95 
+        return (cutoff_freq, self.config.filter_order)
+
     def _create_alpha_masks(
         self,
         timestamps: np.ndarray,
         segments: List[ActivitySegment],
-        unique_activities: set
+        unique_activities: List[ActivityType]
     ) -> Dict[ActivityType, np.ndarray]:
         n_samples = len(timestamps)
         transition_samples = int(self.config.transition_duration * self.config.sampling_rate)
@@ -1,26 +1,29 @@
 import warnings
+import math
 import numpy as np
 from numpy.linalg import norm
-from .quaternion import Quaternion
+from .quaternion import Quaternion, FastQuaternion
 
 class MadgwickAHRS:
     samplePeriod = 1/125
-    quaternion = Quaternion(1, 0, 0, 0)
     beta = 0.1
     zeta = 0
 
     def __init__(self, sampleperiod=None, quaternion=None, beta=None, zeta=None):
         if sampleperiod is not None:
             self.samplePeriod = sampleperiod
+        # The state is updated in place, so every filter owns its quaternion
         if quaternion is not None:
-            self.quaternion = quaternion
+            self.quaternion = FastQuaternion.from_array(quaternion)
+        else:
+            self.quaternion = FastQuaternion(1.0, 0.0, 0.0, 0.0)
         if beta is not None:
             self.beta = beta
         if zeta is not None:
             self.zeta = zeta
 
     def update(self, gyroscope, accelerometer, magnetometer):
-        q = self.quaternion
+        q = Quaternion(self.quaternion.q)
 
         gyroscope = np.array(gyroscope, dtype=float).flatten()
         accelerometer = np.array(accelerometer, dtype=float).flatten()
@@ -72,37 +75,201 @@ class MadgwickAHRS:
 
         # Integrate to yield quaternion
         q += qdot * self.samplePeriod
-        self.quaternion = Quaternion(q / norm(q))  # normalise quaternion
+        self.quaternion = FastQuaternion.from_array(q / norm(q))  # normalise quaternion
 
     def update_imu(self, gyroscope, accelerometer):
         q = self.quaternion
 
-        gyroscope = np.array(gyroscope, dtype=float).flatten()
-        accelerometer = np.array(accelerometer, dtype=float).flatten()
+        gx, gy, gz = np.asarray(gyroscope, dtype=float).ravel().tolist()
+        ax, ay, az = np.asarray(accelerometer, dtype=float).ravel().tolist()
 
         # Normalise accelerometer measurement
-        if norm(accelerometer) is 0:
+        a_norm = math.sqrt(ax*ax + ay*ay + az*az)
+        if a_norm == 0:
             warnings.warn("accelerometer is zero")
             return
-        accelerometer /= norm(accelerometer)
+        ax /= a_norm
+        ay /= a_norm
+        az /= a_norm
 
-        # Gradient descent algorithm corrective step
-        f = np.array([
-            2*(q[1]*q[3] - q[0]*q[2]) - accelerometer[0],
-            2*(q[0]*q[1] + q[2]*q[3]) - accelerometer[1],
-            2*(0.5 - q[1]**2 - q[2]**2) - accelerometer[2]
-        ])
-        j = np.array([
-            [-2*q[2], 2*q[3], -2*q[0], 2*q[1]],
-            [2*q[1], 2*q[0], 2*q[3], 2*q[2]],
-            [0, -4*q[1], -4*q[2], 0]
-        ])
-        step = j.T.dot(f)
-        step /= norm(step)  # normalise step magnitude
+        # Gradient descent algorithm corrective step (J.T @ f)
+        f0 = 2*(q.x*q.z - q.w*q.y) - ax
+        f1 = 2*(q.w*q.x + q.y*q.z) - ay
+        f2 = 2*(0.5 - q.x*q.x - q.y*q.y) - az
+        s0 = -2*q.y*f0 + 2*q.x*f1
+        s1 = 2*q.z*f0 + 2*q.w*f1 - 4*q.x*f2
+        s2 = -2*q.w*f0 + 2*q.z*f1 - 4*q.y*f2
+        s3 = 2*q.x*f0 + 2*q.y*f1
+        s_norm = math.sqrt(s0*s0 + s1*s1 + s2*s2 + s3*s3)  # normalise step magnitude
+        if s_norm > 0:
+            s_norm = self.beta / s_norm
 
         # Compute rate of change of quaternion
-        qdot = (q * Quaternion(0, gyroscope[0], gyroscope[1], gyroscope[2])) * 0.5 - self.beta * step.T
+        qdot = q.copy().imul(FastQuaternion(0.0, gx, gy, gz)).scale_(0.5)
+        qdot.iadd((-s0*s_norm, -s1*s_norm, -s2*s_norm, -s3*s_norm))
 
         # Integrate to yield quaternion
-        q += qdot * self.samplePeriod
-        self.quaternion = Quaternion(q / norm(q))  # normalise quaternion
\ No newline at end of file
+        q.iadd(qdot.scale_(self.samplePeriod)).normalize_()
+
+    def run_imu(self, gyroscope, accelerometer):
+        gyroscope = np.asarray(gyroscope, dtype=float).reshape(-1, 3)
+        accelerometer = np.asarray(accelerometer, dtype=float).reshape(-1, 3)
+        assert len(gyroscope) == len(accelerometer), \
+            "Длины gyroscope и accelerometer должны совпадать"
+
+        n = len(gyroscope)
+        quaternions = np.empty((n, 4))
+        if n == 0:
+            return quaternions
+
+        q0, q1, q2, q3 = self.quaternion
+        beta = self.beta
+        dt = self.samplePeriod
+        sqrt = math.sqrt
+
+        for i, ((gx, gy, gz), (ax, ay, az)) in enumerate(zip(gyroscope.tolist(), accelerometer.tolist())):
+            # Normalise accelerometer measurement
+            a_norm = sqrt(ax*ax + ay*ay + az*az)
+            if a_norm == 0:
+                warnings.warn("accelerometer is zero")
+                quaternions[i] = (q0, q1, q2, q3)
+                continue
+            ax /= a_norm
+            ay /= a_norm
+            az /= a_norm
+
+            # Gradient descent algorithm corrective step (J.T @ f)
+            f0 = 2*(q1*q3 - q0*q2) - ax
+            f1 = 2*(q0*q1 + q2*q3) - ay
+            f2 = 2*(0.5 - q1*q1 - q2*q2) - az
+            s0 = -2*q2*f0 + 2*q1*f1
+            s1 = 2*q3*f0 + 2*q0*f1 - 4*q1*f2
+            s2 = -2*q0*f0 + 2*q3*f1 - 4*q2*f2
+            s3 = 2*q1*f0 + 2*q2*f1
+            s_norm = sqrt(s0*s0 + s1*s1 + s2*s2 + s3*s3)
+            if s_norm > 0:
+                s0 /= s_norm
+                s1 /= s_norm
+                s2 /= s_norm
+                s3 /= s_norm
+
+            # Compute rate of change of quaternion
+            qd0 = 0.5*(-q1*gx - q2*gy - q3*gz) - beta*s0
+            qd1 = 0.5*(q0*gx + q2*gz - q3*gy) - beta*s1
+            qd2 = 0.5*(q0*gy - q1*gz + q3*gx) - beta*s2
+            qd3 = 0.5*(q0*gz + q1*gy - q2*gx) - beta*s3
+
+            # Integrate to yield quaternion
+            q0 += qd0*dt
+            q1 += qd1*dt
+            q2 += qd2*dt
+            q3 += qd3*dt
+            q_norm = sqrt(q0*q0 + q1*q1 + q2*q2 + q3*q3)
+            q0 /= q_norm
+            q1 /= q_norm
+            q2 /= q_norm
+            q3 /= q_norm
+
+            quaternions[i] = (q0, q1, q2, q3)
+
+        self.quaternion.set_(q0, q1, q2, q3)
+        return quaternions
+
+
+class MultiMadgwickAHRS:
+    samplePeriod = 1/125
+    beta = 0.1
+
+    def __init__(self, n_streams, sampleperiod=None, quaternions=None, beta=None):
+        if sampleperiod is not None:
+            self.samplePeriod = sampleperiod
+        if beta is not None:
+            self.beta = beta
+        if quaternions is not None:
+            self.quaternions = np.array(quaternions, dtype=float).reshape(n_streams, 4)
+        else:
+            self.quaternions = np.tile([1.0, 0.0, 0.0, 0.0], (n_streams, 1))
+
+    def update_imu(self, gyroscope, accelerometer):
+        gyroscope = np.asarray(gyroscope, dtype=float).reshape(-1, 3)
+        accelerometer = np.asarray(accelerometer, dtype=float).reshape(-1, 3)
+        self._step(self.quaternions, gyroscope, accelerometer)
+
+    def run_imu(self, gyroscopes, accelerometers):
+        assert len(gyroscopes) == len(accelerometers) == len(self.quaternions), \
+            "Количество потоков gyroscope, accelerometer и фильтров должно совпадать"
+
+        lengths = np.array([len(g) for g in gyroscopes], dtype=int)
+        n_streams = len(lengths)
+        outputs = [np.empty((n, 4)) for n in lengths]
+        if n_streams == 0 or lengths.max() == 0:
+            return outputs
+
+        # Longest streams first: at every time step the active streams are a prefix
+        order = np.argsort(-lengths, kind='stable')
+        sorted_lengths = lengths[order]
+        n_max = sorted_lengths[0]
+
+        gyro = np.zeros((n_max, n_streams, 3))
+        acc = np.zeros((n_max, n_streams, 3))
+        for k, stream in enumerate(order):
+            gyro[:lengths[stream], k] = gyroscopes[stream]
+            acc[:lengths[stream], k] = accelerometers[stream]
+
+        q = self.quaternions[order]
+        history = np.empty((n_max, n_streams, 4))
+        active = np.searchsorted(-sorted_lengths, -np.arange(n_max), side='left')
+
+        for t in range(n_max):
+            k = active[t]
+            self._step(q[:k], gyro[t, :k], acc[t, :k])
+            history[t, :k] = q[:k]
+
+        self.quaternions[order] = q
+        for k, stream in enumerate(order):
+            outputs[stream][:] = history[:lengths[stream], k]
+        return outputs
+
+    def _step(self, q, gyroscope, accelerometer):
+        q0, q1, q2, q3 = q.T
+        gx, gy, gz = gyroscope.T
+
+        # Normalise accelerometer measurement
+        a_norm = np.sqrt(np.einsum('ij,ij->i', accelerometer, accelerometer))
+        valid = a_norm > 0
+        all_valid = valid.all()
+        if not all_valid:
+            warnings.warn("accelerometer is zero")
+            a_norm[~valid] = 1.0
+        ax, ay, az = (accelerometer / a_norm[:, None]).T
+
+        # Gradient descent algorithm corrective step (J.T @ f)
+        f0 = 2*(q1*q3 - q0*q2) - ax
+        f1 = 2*(q0*q1 + q2*q3) - ay
+        f2 = 2*(0.5 - q1*q1 - q2*q2) - az
+        step = np.stack([
+            -2*q2*f0 + 2*q1*f1,
+            2*q3*f0 + 2*q0*f1 - 4*q1*f2,
+            -2*q0*f0 + 2*q3*f1 - 4*q2*f2,
+            2*q1*f0 + 2*q2*f1
+        ], axis=1)
+        s_norm = np.sqrt(np.einsum('ij,ij->i', step, step))
+        s_norm[s_norm == 0] = 1.0
+        step /= s_norm[:, None]
+
+        # Compute rate of change of quaternion
+        qdot = np.stack([
+            -q1*gx - q2*gy - q3*gz,
+            q0*gx + q2*gz - q3*gy,
+            q0*gy - q1*gz + q3*gx,
+            q0*gz + q1*gy - q2*gx
+        ], axis=1) * 0.5 - self.beta * step
+
+        # Integrate to yield quaternion
+        qdot *= self.samplePeriod
+        qdot += q
+        qdot /= np.sqrt(np.einsum('ij,ij->i', qdot, qdot))[:, None]
+        if all_valid:
+            q[:] = qdot
+        else:
+            q[valid] = qdot[valid]
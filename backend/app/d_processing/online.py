@@ -0,0 +1,136 @@
+import time
+import numpy as np
+from typing import List, Dict, Any, Optional
+from .unpacking import BIN_DTYPE
+from .lowp_f import CausalFilter, prefiltration
+from .madgwick import MadgwickAHRS
+from .step_detection import StepDetector
+from .step_pro import calculate_step_metrics_columns, step_metrics_to_dicts
+from .raw_process import StrideTracker, orientation_columns, vertical_acceleration
+from .dclass import Metadata
+from .session_stats import StepAggregate
+from .session_pro import calculate_session_summary_aggregate
+
+class OnlineGaitProcessor:
+    # Live counterpart of GaitAnalysisOrchestrator for one session: every batch is
+    # low-passed causally, advanced through both Madgwick filters and handed to a
+    # StrideTracker, which returns step_metrics rows as soon as a stride is final.
+    def __init__(
+        self,
+        metadata: Optional[Metadata] = None,
+        sampling_rate: int = 125,
+        cutoff: float = 6.0,
+        event_detector: Optional[StepDetector] = None,
+        max_unpaired_seconds: float = 10.0
+    ):
+        self.metadata = metadata
+        self.sampling_rate = sampling_rate
+        self.dt = 1.0 / sampling_rate
+
+        self.lowpass = CausalFilter(cutoff, fs=sampling_rate)
+        self.madgwick_thigh = MadgwickAHRS(sampleperiod=self.dt, beta=0.1)
+        self.madgwick_shank = MadgwickAHRS(sampleperiod=self.dt, beta=0.1)
+        # Live strides are released after one search window plus one peak spacing
+        # past their closing heel strike instead of a full max-length stride
+        event_detector = event_detector or StepDetector()
+        cfg = event_detector.config
+        guard_seconds = cfg.hs_search_window + cfg.ms_peak_distance / cfg.sampling_rate
+        self.tracker = StrideTracker(event_detector, self._step_metrics_columns, guard_seconds=guard_seconds)
+
+        self._pending = {'thigh': [], 'shin': []}
+        # A stream whose partner went quiet keeps only its newest samples
+        self.max_unpaired = int(max_unpaired_seconds * sampling_rate)
+        self.dropped = 0
+        self.last_seen = time.monotonic()
+        self._gyro_sum = np.zeros(3)
+        self._gyro_sq_sum = np.zeros(3)
+        self._orientation_sums = np.zeros(3)
+        self.n_samples = 0
+        # Session statistics so far, updated as strides are emitted
+        self.aggregate = StepAggregate(fs=sampling_rate)
+
+    def push_samples(self, samples: List[Any]) -> List[Dict[str, Any]]:
+        self.last_seen = time.monotonic()
+        for s in samples:
+            self._pending[s.device_pos].append((s.timestamp, *s.acc, *s.gyro))
+
+        # Thigh and shin streams are sampled together; pair them in arrival order
+        n = min(len(self._pending['thigh']), len(self._pending['shin']))
+        thigh = np.array(self._pending['thigh'][:n], dtype=float)
+        shin = np.array(self._pending['shin'][:n], dtype=float)
+        del self._pending['thigh'][:n]
+        del self._pending['shin'][:n]
+        for pending in self._pending.values():
+            excess = len(pending) - self.max_unpaired
+            if excess > 0:
+                del pending[:excess]
+                self.dropped += excess
+        if n == 0:
+            return []
+
+        records = np.zeros(n, dtype=BIN_DTYPE)
+        records['timestamp'] = shin[:, 0]
+        records['acc1'], records['gyro1'] = thigh[:, 1:4], thigh[:, 4:7]
+        records['acc2'], records['gyro2'] = shin[:, 1:4], shin[:, 4:7]
+        return self.push(records)
+
+    def push(self, records: np.ndarray) -> List[Dict[str, Any]]:
+        if len(records) == 0:
+            return []
+
+        filtrated = prefiltration(records, state=self.lowpass)
+
+        q_thigh = self.madgwick_thigh.run_imu(np.deg2rad(filtrated['gyro1']), filtrated['acc1'])
+        q_shank = self.madgwick_shank.run_imu(np.deg2rad(filtrated['gyro2']), filtrated['acc2'])
+        orientations = orientation_columns(q_thigh, q_shank)
+        acc_vertical = vertical_acceleration(q_shank, filtrated['acc2'])
+
+        gyro = filtrated['gyro2'].astype(float)
+        self._gyro_sum += gyro.sum(axis=0)
+        self._gyro_sq_sum += (gyro ** 2).sum(axis=0)
+        self.n_samples += len(records)
+        for k, name in enumerate(orientations.dtype.names):
+            self._orientation_sums[k] += float(np.sum(orientations[name], dtype=float))
+
+        sag_idx, signal_stats = self._sagittal_stats()
+        return self._rows(self.tracker.push(filtrated, orientations, acc_vertical, sag_idx, signal_stats))
+
+    def flush(self) -> List[Dict[str, Any]]:
+        # Emit the strides still held back at the end of the recording
+        if self.n_samples == 0:
+            return []
+        empty = np.zeros(0, dtype=BIN_DTYPE)
+        sag_idx, signal_stats = self._sagittal_stats()
+        return self._rows(self.tracker.push(
+            empty, orientation_columns(np.zeros((0, 4)), np.zeros((0, 4))), np.zeros(0),
+            sag_idx, signal_stats, final=True
+        ))
+
+    def summary(self, activities=None) -> Optional[Dict[str, Any]]:
+        # Session summary of the strides emitted so far
+        if self.metadata is None or self.n_samples == 0:
+            return None
+        orientation_means = {
+            name: np.array([self._orientation_sums[k] / self.n_samples])
+            for k, name in enumerate(('thigh_pitch', 'shank_pitch', 'knee_angle'))
+        }
+        return calculate_session_summary_aggregate(
+            self.aggregate, orientation_means, activities or [], self.metadata
+        )
+
+    def _step_metrics_columns(self, filtrated, orientations, steps, index_offset: int = 0):
+        return calculate_step_metrics_columns(
+            filtrated, orientations, steps, self.sampling_rate, index_offset=index_offset
+        )
+
+    def _rows(self, step_metrics) -> List[Dict[str, Any]]:
+        # Live clients get step_metrics rows; the tracker itself stays columnar
+        table, knee_curves = step_metrics
+        self.aggregate.push(table, knee_curves)
+        return step_metrics_to_dicts(table, knee_curves, self.sampling_rate, self.metadata)
+
+    def _sagittal_stats(self):
+        gyro_mean = self._gyro_sum / self.n_samples
+        gyro_std = np.sqrt(np.maximum(self._gyro_sq_sum / self.n_samples - gyro_mean ** 2, 0.0))
+        sag_idx = int(np.argmax(gyro_std))
+        return sag_idx, (float(gyro_mean[sag_idx]), float(gyro_std[sag_idx]))
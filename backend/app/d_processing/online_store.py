@@ -0,0 +1,40 @@
+import logging
+from typing import Any, Dict, List
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.data.tables import WalkingSessions
+from .online import OnlineGaitProcessor
+from .progress import refresh_user_progress
+from .session_pro import session_summary_values
+from .step_pro import step_metrics_records
+from .step_store import write_step_metrics
+
+logger = logging.getLogger('OnlineStore')
+
+sessions = WalkingSessions.__table__
+
+async def save_online_session(db: AsyncSession, processor: OnlineGaitProcessor) -> List[Dict[str, Any]]:
+    # Ends a live session in the caller's transaction, the same way the worker
+    # ends an uploaded one: the held-back strides are flushed, every emitted
+    # stride goes to step_metrics, the summary completes the session row and
+    # the user's rollups are refreshed. Returns the flushed rows.
+    rows = processor.flush()
+    metadata = processor.metadata
+    summary = processor.summary()
+    if not summary:
+        # Nothing to summarize; the session stays RECORDING so it can still be uploaded
+        logger.warning(f"Session {metadata.session_id}: no steps in the live data")
+        return rows
+
+    table, knee_curves = processor.tracker.step_metrics
+    records = step_metrics_records(
+        table, knee_curves, metadata.session_id, metadata.start_time, processor.sampling_rate
+    )
+    await db.execute(
+        update(sessions)
+        .where(sessions.c.id == metadata.session_id)
+        .values(**session_summary_values(summary, metadata))
+    )
+    await write_step_metrics(db, metadata.session_id, records)
+    await refresh_user_progress(db, metadata.user_id, metadata.start_time)
+    return rows
@@ -0,0 +1,150 @@
+import os
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional, Set
+
+from .dclass import Metadata
+from .step_pro import step_metrics_records
+
+# One orchestrator per worker process, built by the pool initializer
+_orchestrator = None
+
+def _init_worker():
+    global _orchestrator
+    # Pay for scipy and the pipeline construction once per worker, not per upload
+    import scipy.signal  # noqa: F401
+    import scipy.ndimage  # noqa: F401
+    from .raw_process import GaitAnalysisOrchestrator
+    from .unpacking import unpack_bin
+    from .lowp_f import prefiltration
+    from . import session_pro
+
+    _orchestrator = GaitAnalysisOrchestrator(
+        unpack_bin=unpack_bin,
+        prefiltration=prefiltration,
+        session=session_pro
+    )
+
+def _warm_up() -> int:
+    return os.getpid()
+
+def _process_session(raw_data, metadata: Metadata, device_id: Optional[str] = None, with_steps: bool = False):
+    _orchestrator.reset()
+    summary = _orchestrator.process_session(raw_data=raw_data, metadata=metadata, device_id=device_id)
+    if not with_steps:
+        return summary
+    # step_metrics rows are built here too, so the caller only has to copy them out
+    records = []
+    if _orchestrator.step_metrics is not None and isinstance(summary, dict):
+        table, knee_curves = _orchestrator.step_metrics
+        records = step_metrics_records(
+            table, knee_curves, metadata.session_id, metadata.start_time, _orchestrator.sampling_rate
+        )
+    return summary, records
+
+
+class ProcessingPoolBusy(RuntimeError):
+    pass
+
+
+class ProcessingPool:
+    # Runs process_session in worker processes so the CPU-bound pipeline never
+    # holds the API process's GIL. At most max_workers sessions run at once and
+    # max_queued more may wait; reserve() refuses anything beyond that, and a
+    # session id already in flight, so callers can push back before accepting data.
+    def __init__(self, max_workers: int = 2, max_queued: int = 8):
+        self.max_workers = max(1, max_workers)
+        self.max_queued = max(0, max_queued)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._jobs: Set[int] = set()
+
+    @classmethod
+    def from_env(cls) -> 'ProcessingPool':
+        return cls(
+            max_workers=int(os.getenv("PROCESSING_WORKERS", "2")),
+            max_queued=int(os.getenv("PROCESSING_QUEUE", "8"))
+        )
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queued
+
+    @property
+    def full(self) -> bool:
+        return len(self._jobs) >= self.capacity
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'workers': self.max_workers,
+            'in_flight': len(self._jobs),
+            'capacity': self.capacity,
+            'started': self._executor is not None,
+        }
+
+    def start(self):
+        # Spawn every worker now; each runs _init_worker before taking work
+        if self._executor is not None:
+            return
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker
+        )
+        for _ in range(self.max_workers):
+            self._executor.submit(_warm_up)
+
+    def shutdown(self, wait: bool = True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+    def reserve(self, session_id: int):
+        if session_id in self._jobs:
+            raise ProcessingPoolBusy(f"Session {session_id} is already being processed")
+        if self.full:
+            raise ProcessingPoolBusy("Processing queue is full")
+        self._jobs.add(session_id)
+
+    def release(self, session_id: int):
+        self._jobs.discard(session_id)
+
+    async def run(
+        self,
+        session_id: int,
+        raw_data,
+        metadata: Metadata,
+        device_id: Optional[str] = None,
+        with_steps: bool = False
+    ):
+        # Processes a session reserved with reserve(); the reservation ends with the call.
+        # with_steps returns (summary, step_metrics records) instead of the summary
+        try:
+            self.start()
+            if self._slots is None:
+                self._slots = asyncio.Semaphore(self.max_workers)
+            async with self._slots:
+                loop = asyncio.get_running_loop()
+                try:
+                    return await loop.run_in_executor(
+                        self._executor, _process_session, raw_data, metadata, device_id, with_steps
+                    )
+                except BrokenProcessPool:
+                    # A worker died (e.g. killed for memory); the next session gets a fresh pool
+                    self.shutdown(wait=False)
+                    raise
+        finally:
+            self.release(session_id)
+
+    async def submit(
+        self,
+        session_id: int,
+        raw_data,
+        metadata: Metadata,
+        device_id: Optional[str] = None,
+        with_steps: bool = False
+    ):
+        self.reserve(session_id)
+        return await self.run(session_id, raw_data, metadata, device_id, with_steps)
@@ -0,0 +1,154 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from sqlalchemy import select, insert, delete, func, case, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.data.tables import Users, WalkingSessions, StepMetrics, UserProgress, PeriodType, SessionStatus
+
+# Statements go through the tables, as in jobs.py, so the worker never needs
+# the rest of the ORM configured
+users = Users.__table__
+sessions = WalkingSessions.__table__
+steps = StepMetrics.__table__
+progress = UserProgress.__table__
+
+def naive_utc(moment: Optional[datetime]) -> Optional[datetime]:
+    # Session and rollup times are stored as naive UTC; aware inputs (e.g. a
+    # query string ending in Z) are converted rather than having tzinfo dropped
+    if moment is not None and moment.tzinfo is not None:
+        return moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+def period_bounds(moment: datetime, period_type: PeriodType):
+    # Calendar day, or the week starting on Monday, containing moment (UTC)
+    moment = naive_utc(moment)
+    start = datetime(moment.year, moment.month, moment.day)
+    if period_type == PeriodType.WEEK:
+        start -= timedelta(days=start.weekday())
+        return start, start + timedelta(days=7)
+    return start, start + timedelta(days=1)
+
+def _step_weighted(column):
+    # Mean over sessions weighted by their step counts, sessions without a value left out
+    weight = func.coalesce(sessions.c.step_count, 0)
+    return func.sum(column * weight) / func.nullif(
+        func.sum(case((column.is_not(None), weight), else_=0)), 0
+    )
+
+def _round(value) -> Optional[float]:
+    return None if value is None else round(float(value), 2)
+
+async def refresh_user_progress(db: AsyncSession, user_id: int, moment: datetime):
+    # Recomputes the day and week rows holding moment from that user's
+    # completed sessions, in the caller's transaction. Only one user's sessions
+    # in one week are read, so this is cheap enough to run after every session,
+    # and recomputing (rather than adding deltas) keeps reprocessing idempotent.
+    # Refreshes for one user are serialized on the user row: otherwise two
+    # workers would each miss the other's uncommitted session and the second
+    # insert would hit uq_user_progress_period. FOR NO KEY UPDATE does not
+    # block inserts that only reference the user.
+    await db.execute(select(users.c.id).where(users.c.id == user_id).with_for_update(key_share=True))
+    for period_type in PeriodType:
+        start, end = period_bounds(moment, period_type)
+        in_period = and_(
+            sessions.c.user_id == user_id,
+            sessions.c.status == SessionStatus.COMPLETED,
+            sessions.c.start_time >= start,
+            sessions.c.start_time < end
+        )
+        totals = (await db.execute(
+            select(
+                func.count().label('session_count'),
+                func.coalesce(func.sum(sessions.c.step_count), 0).label('step_count'),
+                func.sum(sessions.c.duration).label('total_duration'),
+                _step_weighted(sessions.c.cadence).label('avg_cadence'),
+                _step_weighted(sessions.c.avg_speed).label('avg_speed'),
+                func.avg(sessions.c.gvi).label('avg_gvi'),
+            ).where(in_period)
+        )).one()
+
+        await db.execute(
+            delete(progress).where(
+                progress.c.user_id == user_id,
+                progress.c.period_type == period_type,
+                progress.c.period_start == start
+            )
+        )
+        if not totals.session_count:
+            continue
+
+        knee_rom = (await db.execute(
+            select(func.avg(steps.c.knee_rom))
+            .select_from(steps.join(sessions, steps.c.session_id == sessions.c.id))
+            .where(in_period)
+        )).scalar_one_or_none()
+
+        await db.execute(
+            insert(progress).values(
+                user_id=user_id,
+                period_type=period_type,
+                period_start=start,
+                session_count=totals.session_count,
+                step_count=int(totals.step_count),
+                total_duration=_round(totals.total_duration),
+                avg_cadence=_round(totals.avg_cadence),
+                avg_speed=_round(totals.avg_speed),
+                avg_gvi=_round(totals.avg_gvi),
+                avg_knee_rom=_round(knee_rom),
+                updated_at=datetime.now(timezone.utc)
+            )
+        )
+
+async def get_user_progress(
+    db: AsyncSession,
+    user_id: int,
+    period_type: PeriodType = PeriodType.WEEK,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: Optional[int] = None
+) -> List[Any]:
+    # Newest period first; period_type may also be given by value ('day', 'week')
+    period_type = PeriodType(getattr(period_type, 'value', period_type))
+    start, end = naive_utc(start), naive_utc(end)
+    query = select(progress).where(
+        progress.c.user_id == user_id,
+        progress.c.period_type == period_type
+    )
+    if start is not None:
+        query = query.where(progress.c.period_start >= start)
+    if end is not None:
+        query = query.where(progress.c.period_start < end)
+    query = query.order_by(progress.c.period_start.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    return list((await db.execute(query)).all())
+
+def _weighted_mean(rows, column: str, weight: str) -> Optional[float]:
+    pairs = [(getattr(r, column), getattr(r, weight)) for r in rows if getattr(r, column) is not None]
+    total = sum(w for _, w in pairs)
+    if not total:
+        return None
+    return round(sum(v * w for v, w in pairs) / total, 2)
+
+async def progress_summary(db: AsyncSession, user_id: int, start: datetime, end: datetime) -> Dict[str, Any]:
+    # MedicalReport.summary for [start, end), from the daily rollups;
+    # improvement compares cadence in the first and last week with data
+    start, end = naive_utc(start), naive_utc(end)
+    days = await get_user_progress(db, user_id, PeriodType.DAY, start, end)
+    week_start, _ = period_bounds(start, PeriodType.WEEK)
+    weeks = await get_user_progress(db, user_id, PeriodType.WEEK, week_start, end)
+
+    improvement = None
+    if len(weeks) >= 2 and weeks[-1].avg_cadence and weeks[0].avg_cadence is not None:
+        change = 100 * (weeks[0].avg_cadence - weeks[-1].avg_cadence) / weeks[-1].avg_cadence
+        improvement = f"{change:+.1f}%"
+
+    return {
+        'sessions': sum(d.session_count for d in days),
+        'steps': sum(d.step_count for d in days),
+        'active_days': len(days),
+        'avg_cadence': _weighted_mean(days, 'avg_cadence', 'step_count'),
+        'avg_speed': _weighted_mean(days, 'avg_speed', 'step_count'),
+        'avg_gvi': _weighted_mean(days, 'avg_gvi', 'session_count'),
+        'avg_knee_rom': _weighted_mean(days, 'avg_knee_rom', 'step_count'),
+        'improvement': improvement,
+    }
@@ -1,3 +1,4 @@
+import math
 import numpy as np
 import numbers
 
@@ -92,4 +93,103 @@ class Quaternion:
         return self._q[item]
 
     def __array__(self):
-        return self._q
\ No newline at end of file
+        return self._q
+
+
+class FastQuaternion:
+    __slots__ = ('w', 'x', 'y', 'z')
+
+    def __init__(self, w=1.0, x=0.0, y=0.0, z=0.0):
+        self.w = w
+        self.x = x
+        self.y = y
+        self.z = z
+
+    @classmethod
+    def from_array(cls, q):
+        w, x, y, z = np.asarray(q, dtype=float).ravel().tolist()
+        return cls(w, x, y, z)
+
+    def copy(self):
+        return FastQuaternion(self.w, self.x, self.y, self.z)
+
+    def conj(self):
+        return FastQuaternion(self.w, -self.x, -self.y, -self.z)
+
+    # In-place interfaces: modify self and return it so calls can be chained
+
+    def set_(self, w, x, y, z):
+        self.w = w
+        self.x = x
+        self.y = y
+        self.z = z
+        return self
+
+    def imul(self, other):
+        w, x, y, z = self.w, self.x, self.y, self.z
+        ow, ox, oy, oz = other.w, other.x, other.y, other.z
+        self.w = w*ow - x*ox - y*oy - z*oz
+        self.x = w*ox + x*ow + y*oz - z*oy
+        self.y = w*oy - x*oz + y*ow + z*ox
+        self.z = w*oz + x*oy - y*ox + z*ow
+        return self
+
+    def iadd(self, other):
+        if isinstance(other, FastQuaternion):
+            self.w += other.w
+            self.x += other.x
+            self.y += other.y
+            self.z += other.z
+        else:
+            if len(other) != 4:
+                raise TypeError("Quaternions must be added to other quaternions or a 4-element array")
+            self.w += other[0]
+            self.x += other[1]
+            self.y += other[2]
+            self.z += other[3]
+        return self
+
+    def scale_(self, factor):
+        self.w *= factor
+        self.x *= factor
+        self.y *= factor
+        self.z *= factor
+        return self
+
+    def normalize_(self):
+        n = math.sqrt(self.w*self.w + self.x*self.x + self.y*self.y + self.z*self.z)
+        self.w /= n
+        self.x /= n
+        self.y /= n
+        self.z /= n
+        return self
+
+    def to_euler_angles(self):
+        w, x, y, z = self.w, self.x, self.y, self.z
+        pitch = math.asin(max(-1.0, min(1.0, 2 * x * y + 2 * w * z)))
+        if abs(x * y + z * w - 0.5) < 1e-8:
+            roll = 0
+            yaw = 2 * math.atan2(x, w)
+        elif abs(x * y + z * w + 0.5) < 1e-8:
+            roll = -2 * math.atan2(x, w)
+            yaw = 0
+        else:
+            roll = math.atan2(2 * w * x - 2 * y * z, 1 - 2 * x ** 2 - 2 * z ** 2)
+            yaw = math.atan2(2 * w * y - 2 * x * z, 1 - 2 * y ** 2 - 2 * z ** 2)
+        return roll, pitch, yaw
+
+    @property
+    def q(self):
+        return np.array([self.w, self.x, self.y, self.z])
+
+    def __getitem__(self, item):
+        return (self.w, self.x, self.y, self.z)[item]
+
+    def __iter__(self):
+        return iter((self.w, self.x, self.y, self.z))
+
+    def __array__(self, dtype=None, copy=None):
+        return np.array([self.w, self.x, self.y, self.z], dtype=dtype)
+
+    def __repr__(self):
+        return f"FastQuaternion({self.w}, {self.x}, {self.y}, {self.z})"
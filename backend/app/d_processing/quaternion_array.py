@@ -0,0 +1,108 @@
+import numpy as np
+from .quaternion import Quaternion
+
+class QuaternionArray:
+    def __init__(self, q):
+        if isinstance(q, QuaternionArray):
+            q = q.q
+        q = np.asarray(q, dtype=float)
+        if q.ndim == 1:
+            q = q[np.newaxis, :]
+        if q.ndim != 2 or q.shape[1] != 4:
+            raise ValueError("Expecting an (N, 4) array of w x y z quaternions")
+        self.q = q
+
+    @property
+    def w(self):
+        return self.q[:, 0]
+
+    @property
+    def x(self):
+        return self.q[:, 1]
+
+    @property
+    def y(self):
+        return self.q[:, 2]
+
+    @property
+    def z(self):
+        return self.q[:, 3]
+
+    # Quaternion specific interfaces, evaluated for every row at once
+
+    def conj(self):
+        return QuaternionArray(self.q * np.array([1.0, -1.0, -1.0, -1.0]))
+
+    def multiply(self, other):
+        other = other.q if isinstance(other, QuaternionArray) else np.asarray(other, dtype=float)
+        w, x, y, z = self.q.T
+        ow, ox, oy, oz = np.moveaxis(other, -1, 0)
+        return QuaternionArray(np.stack([
+            w*ow - x*ox - y*oy - z*oz,
+            w*ox + x*ow + y*oz - z*oy,
+            w*oy - x*oz + y*ow + z*ox,
+            w*oz + x*oy - y*ox + z*ow
+        ], axis=1))
+
+    def rotate_vectors(self, v):
+        # q * (0, v) * q.conj() written out as a rotation matrix per row
+        v = np.asarray(v, dtype=float)
+        vx, vy, vz = np.moveaxis(v, -1, 0)
+        w, x, y, z = self.q.T
+        return np.stack([
+            vx * (1 - 2*y**2 - 2*z**2) + vy * (2*x*y - 2*w*z) + vz * (2*x*z + 2*w*y),
+            vx * (2*x*y + 2*w*z) + vy * (1 - 2*x**2 - 2*z**2) + vz * (2*y*z - 2*w*x),
+            vx * (2*x*z - 2*w*y) + vy * (2*y*z + 2*w*x) + vz * (1 - 2*x**2 - 2*y**2)
+        ], axis=1)
+
+    def to_angle_axis(self):
+        w, x, y, z = self.q.T
+        rad = np.arccos(np.clip(w, -1.0, 1.0)) * 2
+        imaginary_factor = np.sin(rad / 2)
+        degenerate = np.abs(imaginary_factor) < 1e-8
+        safe_factor = np.where(degenerate, 1.0, imaginary_factor)
+
+        rad = np.where(degenerate, 0.0, rad)
+        x = np.where(degenerate, 1.0, x / safe_factor)
+        y = np.where(degenerate, 0.0, y / safe_factor)
+        z = np.where(degenerate, 0.0, z / safe_factor)
+        return rad, x, y, z
+
+    @staticmethod
+    def from_angle_axis(rad, x, y, z):
+        rad = np.asarray(rad, dtype=float)
+        s = np.sin(rad / 2)
+        return QuaternionArray(np.stack([np.cos(rad / 2), x*s, y*s, z*s], axis=1))
+
+    def to_euler_angles(self):
+        w, x, y, z = self.q.T
+        singularity = x*y + z*w
+        pitch = np.arcsin(np.clip(2*x*y + 2*w*z, -1.0, 1.0))
+        north = np.abs(singularity - 0.5) < 1e-8
+        south = np.abs(singularity + 0.5) < 1e-8
+
+        roll = np.arctan2(2*w*x - 2*y*z, 1 - 2*x**2 - 2*z**2)
+        yaw = np.arctan2(2*w*y - 2*x*z, 1 - 2*y**2 - 2*z**2)
+        if np.any(north | south):
+            half_turn = 2 * np.arctan2(x, w)
+            roll = np.where(north, 0.0, np.where(south, -half_turn, roll))
+            yaw = np.where(north, half_turn, np.where(south, 0.0, yaw))
+        return roll, pitch, yaw
+
+    def to_euler123(self):
+        w, x, y, z = self.q.T
+        roll = np.arctan2(-2 * (y*z - w*x), w**2 - x**2 - y**2 + z**2)
+        pitch = np.arcsin(np.clip(2 * (x*z + w*x), -1.0, 1.0))
+        yaw = np.arctan2(-2 * (x*y - w*z), w**2 + x**2 - y**2 - z**2)
+        return roll, pitch, yaw
+
+    def __len__(self):
+        return len(self.q)
+
+    def __getitem__(self, item):
+        if isinstance(item, (int, np.integer)):
+            return Quaternion(self.q[item])
+        return QuaternionArray(self.q[item])
+
+    def __array__(self, dtype=None, copy=None):
+        return self.q if dtype is None else self.q.astype(dtype)
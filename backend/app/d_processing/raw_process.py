@@ -5,16 +5,17 @@ import json
 import os
 import datetime
 
-from .unpacking import unpack_bin
+from .unpacking import unpack_bin, unpack_bytes, open_bin
 from .imu_calibration import Calibrator
 from .lowp_f import prefiltration, Filter 
-from .madgwick import MadgwickAHRS
+from .madgwick import MadgwickAHRS, MultiMadgwickAHRS
 from .step_detection import StepDetector
 from .quaternion import Quaternion
+from .quaternion_array import QuaternionArray
 from .detect_act import ActivityDetector
-from .step_pro import calculate_step_metrics
+from .step_pro import calculate_step_metrics_columns, STEP_METRICS_DTYPE, KNEE_CURVE_POINTS
 from .session_pro import calculate_session_summary
-from .dclass import Metadata
+from .dclass import Metadata, GaitCycleTable
 
 def quaternion_to_euler(q: np.ndarray) -> np.ndarray:
         w, x, y, z = q
@@ -35,6 +36,99 @@ def quaternion_to_euler(q: np.ndarray) -> np.ndarray:
 
         return np.array([roll, pitch, yaw])
 
+def vertical_acceleration(q: np.ndarray, acc: np.ndarray, g: float = 9.81) -> np.ndarray:
+        w, x, y, z = np.asarray(q, dtype=float).T
+        ax, ay, az = np.asarray(acc, dtype=float).T
+
+        z_global = ax * (2*x*z + 2*w*y) + ay * (2*y*z - 2*w*x) + az * (1 - 2*x**2 - 2*y**2)
+        return z_global - g
+
+def orientation_columns(q_thigh: np.ndarray, q_shank: np.ndarray) -> np.ndarray:
+        orientations = np.zeros(len(q_thigh), dtype=[('thigh_pitch', 'f4'), ('shank_pitch', 'f4'), ('knee_angle', 'f4')])
+
+        t_pitch = np.rad2deg(QuaternionArray(q_thigh).to_euler_angles()[1])
+        s_pitch = np.rad2deg(QuaternionArray(q_shank).to_euler_angles()[1])
+        orientations['thigh_pitch'] = t_pitch
+        orientations['shank_pitch'] = s_pitch
+        orientations['knee_angle'] = t_pitch - s_pitch
+
+        return orientations
+
+class StrideTracker:
+    # Incremental stride detection over a stream of filtered samples. Every push is
+    # detected together with a carried tail; a stride is emitted once its next heel
+    # strike is `guard` samples away from the end of the data seen so far.
+    # Emitted strides come back as a step_metrics table and knee-curve matrix.
+    def __init__(
+        self,
+        event_detector: StepDetector,
+        step_metrics_columns=calculate_step_metrics_columns,
+        guard_seconds: Optional[float] = None
+    ):
+        cfg = event_detector.config
+        self.event_detector = event_detector
+        self.step_metrics_columns = step_metrics_columns
+        if guard_seconds is None:
+            guard_seconds = cfg.max_step_duration + cfg.hs_search_window
+        self.guard = int(guard_seconds * cfg.sampling_rate)
+        self.carry = int((2 * cfg.max_step_duration + 2 * cfg.hs_search_window) * cfg.sampling_rate) + cfg.ms_peak_distance
+
+        self._cycle_parts = []
+        self._metric_parts = []
+        self.n_samples = 0
+        self.step_count = 0
+        self._last_next_hs = -1
+        self._tail = None
+
+    @property
+    def cycles(self) -> GaitCycleTable:
+        # Accepted strides so far, with indices into the whole recording
+        if len(self._cycle_parts) > 1:
+            self._cycle_parts = [GaitCycleTable.concatenate(self._cycle_parts)]
+        return self._cycle_parts[0] if self._cycle_parts else GaitCycleTable()
+
+    @property
+    def step_metrics(self):
+        # (table, knee_curves) of every emitted stride
+        if not self._metric_parts:
+            return np.zeros(0, dtype=STEP_METRICS_DTYPE), np.zeros((0, KNEE_CURVE_POINTS), dtype=np.float32)
+        if len(self._metric_parts) > 1:
+            tables, curves = zip(*self._metric_parts)
+            self._metric_parts = [(np.concatenate(tables), np.concatenate(curves))]
+        return self._metric_parts[0]
+
+    def push(self, filtrated, orientations, acc_vertical, sag_idx: int, signal_stats=None, final: bool = False):
+        self.n_samples += len(filtrated)
+        if self._tail is not None:
+            filtrated = np.concatenate([self._tail[0], filtrated])
+            orientations = np.concatenate([self._tail[1], orientations])
+            acc_vertical = np.concatenate([self._tail[2], acc_vertical])
+        offset = self.n_samples - len(filtrated)
+
+        found = self.event_detector.detect_cycles(
+            filtrated['gyro2'][:, sag_idx], acc_vertical,
+            signal_stats=signal_stats, remove_outliers=False
+        )
+        mask = found.hs_idx + offset >= self._last_next_hs
+        if not final:
+            mask &= found.next_hs_idx < len(filtrated) - self.guard
+        accepted = found[mask]
+
+        table, knee_curves = np.zeros(0, dtype=STEP_METRICS_DTYPE), np.zeros((0, KNEE_CURVE_POINTS), dtype=np.float32)
+        if len(accepted):
+            table, knee_curves = self.step_metrics_columns(
+                filtrated, orientations, accepted, index_offset=offset
+            )
+            accepted = accepted.shift(offset)
+            self._cycle_parts.append(accepted)
+            self._last_next_hs = int(accepted.next_hs_idx[-1])
+            table['step_number'] = np.arange(self.step_count + 1, self.step_count + len(table) + 1)
+            self.step_count += len(table)
+            self._metric_parts.append((table, knee_curves))
+
+        self._tail = (filtrated[-self.carry:], orientations[-self.carry:], acc_vertical[-self.carry:])
+        return table, knee_curves
+
 class GaitAnalysisOrchestrator:
     def __init__(
         self,
@@ -44,9 +138,9 @@ class GaitAnalysisOrchestrator:
         activity_detector=ActivityDetector(),
         filter=Filter(),
         event_detector=StepDetector(),
-        calculate_step_metrics= None,
         session = None,
-        sampling_rate: int = 125
+        sampling_rate: int = 125,
+        calculate_step_metrics_columns=calculate_step_metrics_columns
     ):
         self.unpacking = unpack_bin
         self.calibrator = calibrator
@@ -54,13 +148,23 @@ class GaitAnalysisOrchestrator:
         self.activity_detector = activity_detector
         self.filter = filter
         self.event_detector = event_detector
-        self.calculate_step_metrics = calculate_step_metrics
+        self.calculate_step_metrics_columns = calculate_step_metrics_columns
         self.session = session
         self.sampling_rate = sampling_rate
+        # (table, knee_curves) of the last processed session, for persisting the steps
+        self.step_metrics = None
         self.dt = 1.0 / sampling_rate
         
         self.madgwick_thigh = MadgwickAHRS(sampleperiod=self.dt, beta=0.1)
         self.madgwick_shank = MadgwickAHRS(sampleperiod=self.dt, beta=0.1)
+
+    def reset(self):
+        # Forget per-session state so one orchestrator can process many sessions;
+        # cached filter designs and spectral plans are kept
+        self.madgwick_thigh = MadgwickAHRS(sampleperiod=self.dt, beta=0.1)
+        self.madgwick_shank = MadgwickAHRS(sampleperiod=self.dt, beta=0.1)
+        self.filter.reset()
+        self.step_metrics = None
     
     def process_session(self, raw_data, metadata, device_id: str = None):
         if device_id is None:
@@ -72,6 +176,8 @@ class GaitAnalysisOrchestrator:
         try:
             if isinstance(raw_data, str):
                 unpacked = self.unpacking(raw_data)
+            elif isinstance(raw_data, (bytes, bytearray, memoryview)):
+                unpacked = unpack_bytes(raw_data)
             else:
                 unpacked = raw_data
         except Exception as e:
@@ -110,42 +216,168 @@ class GaitAnalysisOrchestrator:
             return ' Have an error: {e}'
         
         try:
-            metrics_list = self.calculate_step_metrics(filtrated, orientations, cycles)
+            table, knee_curves = self.calculate_step_metrics_columns(filtrated, orientations, cycles, self.sampling_rate)
+            self.step_metrics = (table, knee_curves)
         except Exception as e:
             return ' Have an error: {e}'
         
         try:
-            session_summary = self.session.calculate_session_summary(metrics_list, orientations, activities, metadata)
+            session_summary = self.session.calculate_session_summary_columns(
+                table, knee_curves, orientations, activities, metadata, fs=self.sampling_rate
+            )
         except Exception as e:
             return ' Have an error: {e}'
 
         return session_summary
 
-    def orientation(self, filtrated: np.ndarray):
-        n = len(filtrated)
-        orientations = np.zeros(n, dtype=[('thigh_pitch', 'f4'), ('shank_pitch', 'f4'), ('knee_angle', 'f4')])
-        acc_vertical = np.zeros(n)
+    def process_session_stream(
+        self,
+        raw_data,
+        metadata,
+        device_id: str = None,
+        chunk_seconds: float = 60.0,
+        overlap_seconds: float = 5.0
+    ):
+        # Two passes over overlapping chunks so that only a chunk and a short
+        # tail are ever resident:
+        #   1) activity windows + global gyro statistics
+        #   2) activity filter, Madgwick (state carried) and step detection
+        # filtfilt stages see `overlap` extra samples on each side, which are dropped.
+        if device_id is None:
+            if isinstance(raw_data, str):
+                device_id = os.path.splitext(os.path.basename(raw_data))[0]
+            else:
+                device_id = "unknown_device"
+
+        try:
+            if isinstance(raw_data, str):
+                unpacked = open_bin(raw_data)
+            elif isinstance(raw_data, (bytes, bytearray, memoryview)):
+                unpacked = unpack_bytes(raw_data)
+            else:
+                unpacked = raw_data
+
+            self.calibrator.load(device_id)
+            self.calibrator.align_to_gravity(unpacked)
+        except Exception as e:
+            return f' Have an error in calibration: {e}'
+
+        n = len(unpacked)
+        chunk = max(int(chunk_seconds * self.sampling_rate), 1)
+        overlap = int(overlap_seconds * self.sampling_rate)
+
+        try:
+            activities, gyro_mean, gyro_std = self._stream_activities(unpacked, chunk, overlap)
+            table, knee_curves, orientation_means = self._stream_steps(
+                unpacked, activities, gyro_mean, gyro_std, chunk, overlap
+            )
+            self.step_metrics = (table, knee_curves)
+            session_summary = self.session.calculate_session_summary_columns(
+                table, knee_curves, orientation_means, activities, metadata, fs=self.sampling_rate
+            )
+        except Exception as e:
+            return f' Have an error: {e}'
+
+        return session_summary
+
+    def _prefiltrated_chunk(self, unpacked: np.ndarray, lo: int, hi: int) -> np.ndarray:
+        return self.prefiltration(self.calibrator.apply(unpacked[lo:hi]))
+
+    def _stream_activities(self, unpacked: np.ndarray, chunk: int, overlap: int):
+        n = len(unpacked)
+        # The window engine keeps its running sums across chunks, so each chunk
+        # only contributes its own samples and windows stay on the global grid
+        engine = self.activity_detector.window_engine()
+        windows = []
+        gyro_sum = np.zeros(3)
+        gyro_sq_sum = np.zeros(3)
+
+        for start in range(0, n, chunk):
+            end = min(start + chunk, n)
+            lo = max(0, start - overlap)
+            hi = min(n, end + overlap)
+            prefiltrated = self._prefiltrated_chunk(unpacked, lo, hi)[start - lo:end - lo]
+
+            gyro = prefiltrated['gyro2'].astype(float)
+            gyro_sum += gyro.sum(axis=0)
+            gyro_sq_sum += (gyro ** 2).sum(axis=0)
+
+            windows += self.activity_detector.window_segments(*engine.push(prefiltrated))
+
+        gyro_mean = gyro_sum / max(n, 1)
+        gyro_std = np.sqrt(np.maximum(gyro_sq_sum / max(n, 1) - gyro_mean ** 2, 0.0))
+        return self.activity_detector._merge_segments(windows), gyro_mean, gyro_std
+
+    def _stream_steps(self, unpacked, activities, gyro_mean, gyro_std, chunk: int, overlap: int):
+        n = len(unpacked)
+        sag_idx = int(np.argmax(gyro_std))
+        signal_stats = (float(gyro_mean[sag_idx]), float(gyro_std[sag_idx]))
+
+        tracker = StrideTracker(self.event_detector, self._stride_metrics)
+        orientation_sums = np.zeros(3)
+
+        for start in range(0, n, chunk):
+            end = min(start + chunk, n)
+            lo = max(0, start - overlap)
+            hi = min(n, end + overlap)
+            prefiltrated = self._prefiltrated_chunk(unpacked, lo, hi)
+            filtrated = self.filter.process(prefiltrated, activities)[start - lo:end - lo]
+
+            q_thigh = self.madgwick_thigh.run_imu(np.deg2rad(filtrated['gyro1']), filtrated['acc1'])
+            q_shank = self.madgwick_shank.run_imu(np.deg2rad(filtrated['gyro2']), filtrated['acc2'])
+            orientations = orientation_columns(q_thigh, q_shank)
+            acc_vertical = vertical_acceleration(q_shank, filtrated['acc2'])
+            for k, field in enumerate(orientations.dtype.names):
+                orientation_sums[k] += float(np.sum(orientations[field], dtype=float))
+
+            tracker.push(
+                filtrated, orientations, acc_vertical, sag_idx, signal_stats, final=end == n
+            )
+
+        table, knee_curves = tracker.step_metrics
+        if self.event_detector.config.enable_outlier_removal and len(tracker.cycles) > 3:
+            kept = np.isin(table['hs_idx'], self.event_detector._remove_outliers(tracker.cycles).hs_idx)
+            table, knee_curves = table[kept], knee_curves[kept]
+        table['step_number'] = np.arange(1, len(table) + 1)
+
+        orientation_means = {
+            field: np.array([orientation_sums[k] / max(n, 1)])
+            for k, field in enumerate(('thigh_pitch', 'shank_pitch', 'knee_angle'))
+        }
+        return table, knee_curves, orientation_means
+
+    def _stride_metrics(self, filtrated, orientations, steps, index_offset: int = 0):
+        return self.calculate_step_metrics_columns(
+            filtrated, orientations, steps, self.sampling_rate, index_offset=index_offset
+        )
+
+    def orientation_many(self, filtrated_list):
+        gyroscopes, accelerometers = [], []
+        for filtrated in filtrated_list:
+            gyroscopes += [np.deg2rad(filtrated['gyro1']), np.deg2rad(filtrated['gyro2'])]
+            accelerometers += [filtrated['acc1'], filtrated['acc2']]
+
+        ahrs = MultiMadgwickAHRS(len(gyroscopes), sampleperiod=self.dt, beta=0.1)
+        quaternions = ahrs.run_imu(gyroscopes, accelerometers)
+
+        return [
+            self.orientation(filtrated, quaternions=(quaternions[2*k], quaternions[2*k + 1]))
+            for k, filtrated in enumerate(filtrated_list)
+        ]
+
+    def orientation(self, filtrated: np.ndarray, quaternions=None):
         gyro_shank_rad = np.deg2rad(filtrated['gyro2'])
         sag_idx = np.argmax(np.std(gyro_shank_rad, axis=0))
         gyro_sagittal = filtrated['gyro2'][:, sag_idx]
 
-        for i in range(n):
-            self.madgwick_thigh.update_imu(np.deg2rad(filtrated['gyro1'][i]), filtrated['acc1'][i])
-            t_pitch = np.rad2deg(self.madgwick_thigh.quaternion.to_euler_angles()[1]) 
-        
-            self.madgwick_shank.update_imu(gyro_shank_rad[i], filtrated['acc2'][i])
-            q_s = self.madgwick_shank.quaternion.q
-            s_pitch = np.rad2deg(self.madgwick_shank.quaternion.to_euler_angles()[1])
-        
-            ax, ay, az = filtrated['acc2'][i]
-            w, x, y, z = q_s
-            z_global = (ax * (2*x*z + 2*w*y) + ay * (2*y*z - 2*w*x) + az * (1 - 2*x**2 - 2*y**2))
-            acc_vertical[i] = z_global - 9.81
-        
-            orientations[i]['thigh_pitch'] = t_pitch
-            orientations[i]['shank_pitch'] = s_pitch
-            orientations[i]['knee_angle'] = t_pitch - s_pitch
+        if quaternions is None:
+            q_thigh = self.madgwick_thigh.run_imu(np.deg2rad(filtrated['gyro1']), filtrated['acc1'])
+            q_shank = self.madgwick_shank.run_imu(gyro_shank_rad, filtrated['acc2'])
+        else:
+            q_thigh, q_shank = quaternions
+
+        orientations = orientation_columns(q_thigh, q_shank)
+        acc_vertical = vertical_acceleration(q_shank, filtrated['acc2'])
 
         cycles = self.event_detector.detect_cycles(gyro_sagittal, acc_vertical, filtrated['timestamp'])
         return cycles, orientations
-  
\ No newline at end of file
@@ -0,0 +1,177 @@
+import os
+import json
+import zlib
+import struct
+import hashlib
+from typing import Iterator, List, Optional, Tuple, Union
+import numpy as np
+from .unpacking import BIN_DTYPE, unpack_bytes
+
+# Uploaded recordings, one archive per session. Workers on other machines
+# need this directory shared with the API (or a mount of the same bucket).
+RAW_STORAGE = os.getenv("RAW_STORAGE", "storage/raw")
+
+# Archive layout: MAGIC, u32 header length, JSON header, then the chunks.
+# A chunk holds CHUNK_SAMPLES records stored column by column with the bytes
+# of each value shuffled (all first bytes, then all second bytes, ...) and
+# deflated; sensor floats at 125 Hz compress far better that way than as
+# packed records. The header lists every chunk's time span and byte range,
+# so a time window only reads and inflates the chunks it overlaps.
+MAGIC = b'IMUARC1\n'
+CHUNK_SAMPLES = 125 * 30
+COMPRESSION_LEVEL = int(os.getenv("RAW_COMPRESSION_LEVEL", "6"))
+
+_HEADER_LEN = struct.Struct('<I')
+
+def raw_path(session_id: int, storage: Optional[str] = None) -> str:
+    return os.path.join(storage or RAW_STORAGE, f"session_{session_id}.imu")
+
+def _shuffle(column: np.ndarray) -> bytes:
+    values = np.ascontiguousarray(column).reshape(len(column), -1).view(np.uint8)
+    return np.ascontiguousarray(values.T).tobytes()
+
+def _unshuffle(buffer: bytes, count: int, dtype: np.dtype) -> np.ndarray:
+    values = np.frombuffer(buffer, dtype=np.uint8).reshape(dtype.itemsize, count)
+    return np.ascontiguousarray(values.T).view(dtype.base).reshape((count,) + dtype.shape)
+
+def _pack_chunk(records: np.ndarray) -> bytes:
+    return zlib.compress(
+        b''.join(_shuffle(records[name]) for name in BIN_DTYPE.names),
+        COMPRESSION_LEVEL
+    )
+
+def _unpack_chunk(payload: bytes, count: int) -> np.ndarray:
+    buffer = zlib.decompress(payload)
+    records = np.empty(count, dtype=BIN_DTYPE)
+    offset = 0
+    for name in BIN_DTYPE.names:
+        field = BIN_DTYPE.fields[name][0]
+        size = field.itemsize * count
+        records[name] = _unshuffle(buffer[offset:offset + size], count, field)
+        offset += size
+    return records
+
+def write_archive(path: str, data: bytes) -> dict:
+    records = unpack_bytes(data)
+    body = []
+    chunks = []
+    offset = 0
+    for start in range(0, len(records), CHUNK_SAMPLES):
+        part = records[start:start + CHUNK_SAMPLES]
+        payload = _pack_chunk(part)
+        timestamps = part['timestamp']
+        chunks.append([float(timestamps.min()), float(timestamps.max()), start, len(part), offset, len(payload)])
+        body.append(payload)
+        offset += len(payload)
+
+    header = {
+        # Identifies the recording itself, whatever session it is filed under
+        'sha256': hashlib.sha256(records.tobytes()).hexdigest(),
+        'samples': len(records),
+        'raw_bytes': records.nbytes,
+        'chunks': chunks,
+    }
+    encoded = json.dumps(header, separators=(',', ':')).encode()
+
+    # Written under a temporary name and renamed, so a reader never sees half a file
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.part"
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(_HEADER_LEN.pack(len(encoded)))
+        f.write(encoded)
+        for payload in body:
+            f.write(payload)
+    os.replace(tmp_path, path)
+    return header
+
+
+class RawArchive:
+    # Read side of a session archive. read() returns BIN_DTYPE records, the
+    # same thing unpack_bin gives, so the result goes straight into
+    # process_session / process_session_stream.
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a raw archive")
+            (length,) = _HEADER_LEN.unpack(f.read(_HEADER_LEN.size))
+            self.header = json.loads(f.read(length))
+            self._data_offset = f.tell()
+        # [t_min, t_max, first_sample, count, offset, length] per chunk
+        self.chunks: List[list] = self.header['chunks']
+
+    @property
+    def samples(self) -> int:
+        return self.header['samples']
+
+    @property
+    def sha256(self) -> str:
+        return self.header['sha256']
+
+    @property
+    def time_range(self) -> Tuple[float, float]:
+        if not self.chunks:
+            return (0.0, 0.0)
+        return (min(c[0] for c in self.chunks), max(c[1] for c in self.chunks))
+
+    def _read_chunks(self, chunks: List[list]) -> Iterator[np.ndarray]:
+        with open(self.path, 'rb') as f:
+            for _, _, _, count, offset, length in chunks:
+                f.seek(self._data_offset + offset)
+                yield _unpack_chunk(f.read(length), count)
+
+    def iter_chunks(self, start: Optional[float] = None, stop: Optional[float] = None) -> Iterator[np.ndarray]:
+        # Chunk by chunk, for callers that process incrementally
+        selected = [
+            c for c in self.chunks
+            if (start is None or c[1] >= start) and (stop is None or c[0] < stop)
+        ]
+        for records in self._read_chunks(selected):
+            if start is not None or stop is not None:
+                timestamps = records['timestamp']
+                mask = np.ones(len(records), dtype=bool)
+                if start is not None:
+                    mask &= timestamps >= start
+                if stop is not None:
+                    mask &= timestamps < stop
+                records = records[mask]
+            yield records
+
+    def read(self, start: Optional[float] = None, stop: Optional[float] = None) -> np.ndarray:
+        # Records with start <= timestamp < stop (device seconds); all of them by default
+        parts = list(self.iter_chunks(start, stop))
+        if not parts:
+            return np.empty(0, dtype=BIN_DTYPE)
+        return np.concatenate(parts)
+
+    def read_samples(self, first: int = 0, last: Optional[int] = None) -> np.ndarray:
+        # Records by position, first <= i < last
+        last = self.samples if last is None else min(last, self.samples)
+        selected = [c for c in self.chunks if c[2] < last and c[2] + c[3] > first]
+        parts = [
+            records[max(first - c[2], 0):last - c[2]]
+            for c, records in zip(selected, self._read_chunks(selected))
+        ]
+        if not parts:
+            return np.empty(0, dtype=BIN_DTYPE)
+        return np.concatenate(parts)
+
+
+def save_raw(session_id: int, data: bytes, storage: Optional[str] = None) -> str:
+    path = raw_path(session_id, storage)
+    write_archive(path, data)
+    return path
+
+def has_raw(session_id: int, storage: Optional[str] = None) -> bool:
+    return os.path.exists(raw_path(session_id, storage))
+
+def load_raw(path: str, start: Optional[float] = None, stop: Optional[float] = None) -> Union[np.ndarray, bytes]:
+    # Archives come back as records; recordings saved before the archive
+    # format (plain .bin) come back as bytes, which process_session also takes
+    with open(path, 'rb') as f:
+        is_archive = f.read(len(MAGIC)) == MAGIC
+    if is_archive:
+        return RawArchive(path).read(start, stop)
+    with open(path, 'rb') as f:
+        return f.read()
@@ -0,0 +1,216 @@
+import numpy as np
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+from .step_pro import KNEE_CURVE_POINTS
+
+# Per-step values a session summary is built from; stance_fraction is stance_time / step_time
+STEP_COLUMNS = (
+    'step_time', 'stance_time', 'swing_time', 'stance_fraction', 'knee_rom',
+    'knee_flexion_max', 'knee_extension_min', 'hip_flexion_max', 'hip_extension_min',
+    'impact_force', 'peak_angular_velocity',
+)
+
+@dataclass
+class ColumnStats:
+    count: int
+    mean: float
+    std: float
+    min: float
+    max: float
+
+    @property
+    def total(self) -> float:
+        return self.mean * self.count
+
+    @property
+    def cv(self) -> float:
+        if self.count == 0 or self.mean == 0:
+            return 0.0
+        return self.std / self.mean * 100
+
+
+class RunningMoments:
+    # Count, mean, sum of squared deviations, min and max for every (bin, column).
+    # Batches and other instances are folded in with Chan's pairwise update, so
+    # partial results from chunks, workers or sessions combine without the samples.
+    def __init__(self, n_bins: int, n_columns: int):
+        self.count = np.zeros(n_bins, dtype=np.int64)
+        self.mean = np.zeros((n_bins, n_columns))
+        self.m2 = np.zeros((n_bins, n_columns))
+        self.min = np.full((n_bins, n_columns), np.inf)
+        self.max = np.full((n_bins, n_columns), -np.inf)
+
+    def push(self, bins: np.ndarray, values: np.ndarray) -> 'RunningMoments':
+        values = np.asarray(values, dtype=float).reshape(len(bins), -1)
+        count = np.bincount(bins, minlength=len(self.count))
+        mean = np.zeros_like(self.mean)
+        np.add.at(mean, bins, values)
+        mean /= np.maximum(count, 1)[:, np.newaxis]
+        m2 = np.zeros_like(self.m2)
+        np.add.at(m2, bins, (values - mean[bins]) ** 2)
+        lo = np.full_like(self.min, np.inf)
+        hi = np.full_like(self.max, -np.inf)
+        np.minimum.at(lo, bins, values)
+        np.maximum.at(hi, bins, values)
+        self._combine(count, mean, m2, lo, hi)
+        return self
+
+    def merge(self, other: 'RunningMoments') -> 'RunningMoments':
+        self._combine(other.count, other.mean, other.m2, other.min, other.max)
+        return self
+
+    def _combine(self, count, mean, m2, lo, hi):
+        n = self.count + count
+        scale = np.maximum(n, 1)[:, np.newaxis]
+        delta = mean - self.mean
+        self.m2 = self.m2 + m2 + delta ** 2 * (self.count * count)[:, np.newaxis] / scale
+        self.mean = self.mean + delta * count[:, np.newaxis] / scale
+        self.count = n
+        self.min = np.minimum(self.min, lo)
+        self.max = np.maximum(self.max, hi)
+
+    def total(self, bins: np.ndarray) -> Tuple[int, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        # Count, mean, population std, min and max per column over the selected bins
+        count = self.count[bins]
+        n = int(count.sum())
+        if n == 0:
+            nan = np.full(self.mean.shape[1], np.nan)
+            return 0, nan, nan, nan, nan
+        weights = count[:, np.newaxis]
+        mean = (weights * self.mean[bins]).sum(axis=0) / n
+        m2 = self.m2[bins].sum(axis=0) + (weights * (self.mean[bins] - mean) ** 2).sum(axis=0)
+        return n, mean, np.sqrt(m2 / n), self.min[bins].min(axis=0), self.max[bins].max(axis=0)
+
+
+class QuantileSketch:
+    # Counts on the grid k / rate for lo <= k / rate <= hi. Step times are whole
+    # numbers of samples, so with rate = fs the quantiles equal np.percentile over
+    # the raw values; off-grid values move by at most half a grid step.
+    def __init__(self, lo: float, hi: float, rate: float):
+        self.lo = lo
+        self.hi = hi
+        self.rate = rate
+        self._first = int(np.rint(lo * rate))
+        self.counts = np.zeros(int(np.rint(hi * rate)) - self._first + 1, dtype=np.int64)
+
+    @property
+    def grid(self) -> np.ndarray:
+        return np.arange(self._first, self._first + len(self.counts)) / self.rate
+
+    @property
+    def count(self) -> int:
+        return int(self.counts.sum())
+
+    def bin_index(self, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # Grid bin of every value and whether it lies inside [lo, hi]
+        values = np.asarray(values, dtype=float)
+        inside = (values >= self.lo) & (values <= self.hi)
+        bins = np.clip(np.rint(values * self.rate).astype(np.int64) - self._first, 0, len(self.counts) - 1)
+        return bins, inside
+
+    def add(self, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        bins, inside = self.bin_index(values)
+        self.counts += np.bincount(bins[inside], minlength=len(self.counts))
+        return bins, inside
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        if (other._first, len(other.counts), other.rate) != (self._first, len(self.counts), self.rate):
+            raise ValueError("Cannot merge sketches built on different grids")
+        self.counts += other.counts
+        return self
+
+    def quantile(self, q) -> np.ndarray:
+        # Linear interpolation between order statistics, as np.percentile does
+        n = self.count
+        q = np.asarray(q, dtype=float)
+        if n == 0:
+            return np.full(q.shape, np.nan)
+        position = (n - 1) * q
+        below = np.floor(position).astype(np.int64)
+        above = np.minimum(below + 1, n - 1)
+        cumulative = np.cumsum(self.counts)
+        grid = self.grid
+        lower = grid[np.searchsorted(cumulative, below, side='right')]
+        upper = grid[np.searchsorted(cumulative, above, side='right')]
+        return lower + (upper - lower) * (position - below)
+
+
+class StepAggregate:
+    # Mergeable running summary of a stream of steps. Every statistic is kept per
+    # step-time bin of the sketch: the IQR artifact fences are only known once all
+    # steps are in, and then they select bins instead of rereading step rows.
+    def __init__(self, fs: int = 125, min_step_time: float = 0.25, max_step_time: float = 2.5, min_steps_for_iqr: int = 10):
+        self.sketch = QuantileSketch(min_step_time, max_step_time, fs)
+        self.moments = RunningMoments(len(self.sketch.counts), len(STEP_COLUMNS))
+        self.curve_moments = RunningMoments(len(self.sketch.counts), KNEE_CURVE_POINTS)
+        self.min_steps_for_iqr = min_steps_for_iqr
+        self.rejected = 0  # steps outside [min_step_time, max_step_time]
+
+    @property
+    def step_count(self) -> int:
+        # Every step pushed, artifacts included
+        return self.sketch.count + self.rejected
+
+    def push(self, table: np.ndarray, knee_curves: np.ndarray) -> 'StepAggregate':
+        if len(table) == 0:
+            return self
+        bins, inside = self.sketch.add(table['step_time'])
+        self.rejected += int(np.count_nonzero(~inside))
+        if not np.any(inside):
+            return self
+
+        table = table[inside]
+        columns = np.empty((len(table), len(STEP_COLUMNS)))
+        for k, name in enumerate(STEP_COLUMNS):
+            if name == 'stance_fraction':
+                columns[:, k] = table['stance_time'] / table['step_time']
+            else:
+                columns[:, k] = table[name]
+        self.moments.push(bins[inside], columns)
+        self.curve_moments.push(bins[inside], knee_curves[inside])
+        return self
+
+    def merge(self, other: 'StepAggregate') -> 'StepAggregate':
+        self.sketch.merge(other.sketch)
+        self.moments.merge(other.moments)
+        self.curve_moments.merge(other.curve_moments)
+        self.rejected += other.rejected
+        return self
+
+    def clean_bins(self) -> np.ndarray:
+        # Step-time bins that survive the artifact filter: the plausible range,
+        # then Tukey fences once there are enough steps for quartiles to mean something
+        occupied = self.sketch.counts > 0
+        if self.sketch.count < self.min_steps_for_iqr:
+            return occupied
+        q1, q3 = self.sketch.quantile([0.25, 0.75])
+        iqr = q3 - q1
+        grid = self.sketch.grid
+        return occupied & (grid >= q1 - 1.5 * iqr) & (grid <= q3 + 1.5 * iqr)
+
+    def stats(self) -> Dict[str, ColumnStats]:
+        # Statistics of the clean steps per STEP_COLUMNS entry, plus 'knee_angle'
+        # over every point of every normalised knee curve
+        bins = self.clean_bins()
+        n, mean, std, lo, hi = self.moments.total(bins)
+        stats = {
+            name: ColumnStats(n, float(mean[k]), float(std[k]), float(lo[k]), float(hi[k]))
+            for k, name in enumerate(STEP_COLUMNS)
+        }
+
+        n, mean, std, lo, hi = self.curve_moments.total(bins)
+        # Pooled over the curve points, which all hold the same number of steps
+        pooled_mean = float(np.mean(mean))
+        pooled_std = float(np.sqrt(np.mean(std ** 2 + (mean - pooled_mean) ** 2)))
+        stats['knee_angle'] = ColumnStats(n * KNEE_CURVE_POINTS, pooled_mean, pooled_std, float(np.min(lo)), float(np.max(hi)))
+        return stats
+
+    def ensemble_curve(self) -> Dict[str, List[float]]:
+        # Same output as step_pro.ensemble_curve over the clean steps
+        n, mean, std, _, _ = self.curve_moments.total(self.clean_bins())
+        if n == 0:
+            return {'mean': [], 'std': []}
+        return {
+            'mean': np.round(mean, 3).tolist(),
+            'std': np.round(std, 3).tolist(),
+        }
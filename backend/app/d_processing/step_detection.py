@@ -1,8 +1,8 @@
 import numpy as np
 from dataclasses import dataclass
-from typing import List, Dict, Optional, Tuple
+from typing import Dict, Optional, Tuple
 from scipy import signal
-from .dclass import GaitCycle, DetectorConfig
+from .dclass import GaitCycleTable, DetectorConfig
 
 class StepDetector:
     def __init__(self, config: Optional[DetectorConfig] = None):
@@ -12,8 +12,10 @@ class StepDetector:
         self,
         gyro_sagittal: np.ndarray,
         acc_vertical: np.ndarray,
-        timestamps: Optional[np.ndarray] = None
-    ) -> List[GaitCycle]:
+        timestamps: Optional[np.ndarray] = None,
+        signal_stats: Optional[Tuple[float, float]] = None,
+        remove_outliers: Optional[bool] = None
+    ) -> GaitCycleTable:
         assert len(gyro_sagittal) == len(acc_vertical), \
             "Длины gyro_sagittal и acc_vertical должны совпадать"
         
@@ -21,72 +23,70 @@ class StepDetector:
         
         if timestamps is None:
             timestamps = np.arange(n_samples) / self.config.sampling_rate
-        ms_indices = self._detect_mid_swing_peaks(gyro_sagittal)
+        ms_indices = self._detect_mid_swing_peaks(gyro_sagittal, signal_stats)
         
         if len(ms_indices) < 2:
-            return []  
-        hs_indices = []
-        for ms_idx in ms_indices:
-            hs_idx = self._detect_heel_strike(
-                gyro_sagittal, acc_vertical, ms_idx
-            )
-            if hs_idx is not None:
-                hs_indices.append(hs_idx)
+            return GaitCycleTable()  
+        hs_indices = self._detect_heel_strikes(gyro_sagittal, acc_vertical, ms_indices)
+        hs_indices = hs_indices[hs_indices >= 0]
         
         if len(hs_indices) < 2:
-            return []  
-        cycles = []
-        
-        for i in range(len(hs_indices) - 1):
-            current_hs = hs_indices[i]
-            next_hs = hs_indices[i + 1]
-            duration = (next_hs - current_hs) / self.config.sampling_rate
-            if duration < self.config.min_step_duration or \
-               duration > self.config.max_step_duration:
-                continue
-            ms_candidates = ms_indices[(ms_indices > current_hs) & (ms_indices < next_hs)]
-            if len(ms_candidates) == 0:
-                continue
-            
-            if len(ms_candidates) > 1:
-                peak_heights = gyro_sagittal[ms_candidates]
-                ms_idx = ms_candidates[np.argmax(peak_heights)]
-            else:
-                ms_idx = ms_candidates[0]
-            
-            to_idx = self._detect_toe_off(
-                gyro_sagittal, current_hs, ms_idx
-            )
-            
-            if to_idx is None:
-                continue
-            
-            stride_time = duration
-            stance_time = (to_idx - current_hs) / self.config.sampling_rate
-            swing_time = (next_hs - to_idx) / self.config.sampling_rate
-            cadence = 60.0 / stride_time  
-            
-            cycle = GaitCycle(
-                hs_idx=current_hs,
-                to_idx=to_idx,
-                next_hs_idx=next_hs,
-                ms_idx=ms_idx,
-                duration=duration,
-                stride_time=stride_time,
-                stance_time=stance_time,
-                swing_time=swing_time,
-                cadence=cadence
-            )
-            cycles.append(cycle)
-        
-        if self.config.enable_outlier_removal and len(cycles) > 3:
+            return GaitCycleTable()  
+        
+        current_hs = hs_indices[:-1]
+        next_hs = hs_indices[1:]
+        duration = (next_hs - current_hs) / self.config.sampling_rate
+        valid = ((duration >= self.config.min_step_duration) &
+                 (duration <= self.config.max_step_duration))
+        
+        # Mid-swing peaks strictly between the two heel strikes; the highest one wins
+        lo = np.searchsorted(ms_indices, current_hs, side='right')
+        hi = np.searchsorted(ms_indices, next_hs, side='left')
+        valid &= hi > lo
+        current_hs, next_hs, duration, lo, hi = (
+            x[valid] for x in (current_hs, next_hs, duration, lo, hi)
+        )
+        ms_idx = self._highest_peaks(gyro_sagittal, ms_indices, lo, hi)
+        
+        to_idx = self._detect_toe_offs(gyro_sagittal, current_hs, ms_idx)
+        valid = to_idx >= 0
+        current_hs, next_hs, duration, ms_idx, to_idx = (
+            x[valid] for x in (current_hs, next_hs, duration, ms_idx, to_idx)
+        )
+        
+        stance_time = (to_idx - current_hs) / self.config.sampling_rate
+        swing_time = (next_hs - to_idx) / self.config.sampling_rate
+        cadence = 60.0 / duration  
+        
+        cycles = GaitCycleTable(
+            hs_idx=current_hs,
+            to_idx=to_idx,
+            next_hs_idx=next_hs,
+            ms_idx=ms_idx,
+            duration=duration,
+            stance_time=stance_time,
+            swing_time=swing_time,
+            cadence=cadence
+        )
+        
+        if remove_outliers is None:
+            remove_outliers = self.config.enable_outlier_removal
+        if remove_outliers and len(cycles) > 3:
             cycles = self._remove_outliers(cycles)
         
         return cycles
     
-    def _detect_mid_swing_peaks(self, gyro_sagittal: np.ndarray) -> np.ndarray:
-        signal_std = np.std(gyro_sagittal)
-        signal_mean = np.mean(gyro_sagittal)
+    def _detect_mid_swing_peaks(
+        self,
+        gyro_sagittal: np.ndarray,
+        signal_stats: Optional[Tuple[float, float]] = None
+    ) -> np.ndarray:
+        # signal_stats = (mean, std) of the whole recording when only a part of it is passed
+        if signal_stats is not None:
+            signal_mean, signal_std = signal_stats
+        else:
+            signal_std = np.std(gyro_sagittal)
+            signal_mean = np.mean(gyro_sagittal)
         
         height_threshold = signal_mean + self.config.ms_peak_height_factor * signal_std
         prominence_threshold = self.config.ms_peak_prominence_factor * signal_std
@@ -100,76 +100,138 @@ class StepDetector:
         
         return peaks
     
-    def _detect_heel_strike(
+    def _detect_heel_strikes(
         self,
         gyro_sagittal: np.ndarray,
         acc_vertical: np.ndarray,
-        ms_idx: int
-    ) -> Optional[int]:
+        ms_indices: np.ndarray
+    ) -> np.ndarray:
+        # Heel strike after each mid-swing peak, searched in [ms, ms + window):
+        # the first downward zero crossing of the gyro, else the first acc_vertical
+        # minimum, else the first negative gyro sample; -1 where none is found.
+        # Every candidate is located once over the whole signal and assigned to
+        # the windows with searchsorted.
+        n_samples = len(gyro_sagittal)
         search_window = int(self.config.hs_search_window * self.config.sampling_rate)
-        search_start = ms_idx
-        search_end = min(ms_idx + search_window, len(gyro_sagittal))
-        
-        if search_end <= search_start:
-            return None
-        
-        gyro_window = gyro_sagittal[search_start:search_end]
-        acc_window = acc_vertical[search_start:search_end]
-        
-        sign_changes = np.diff(np.sign(gyro_window))
-        zero_crossings = np.where(sign_changes < 0)[0]
-        
-        if len(zero_crossings) > 0:
-            hs_idx_relative = zero_crossings[0]
-            return search_start + hs_idx_relative
-        
-        acc_minima, _ = signal.find_peaks(-acc_window)
-        
-        if len(acc_minima) > 0:
-            hs_idx_relative = acc_minima[0]
-            return search_start + hs_idx_relative
-        
-        negative_indices = np.where(gyro_window < 0)[0]
-        if len(negative_indices) > 0:
-            return search_start + negative_indices[0]
-        
-        return None
+        search_start = ms_indices
+        search_end = np.minimum(ms_indices + search_window, n_samples)
+        
+        def first_at_or_after(candidates: np.ndarray, start: np.ndarray) -> np.ndarray:
+            candidates = np.append(candidates, np.iinfo(np.int64).max)
+            return candidates[np.searchsorted(candidates, start)]
+        
+        # A decrease of sign between samples i and i + 1 lies in the window if i <= end - 2
+        zero_crossings = np.flatnonzero(np.diff(np.sign(gyro_sagittal)) < 0)
+        crossing = first_at_or_after(zero_crossings, search_start)
+        
+        # A minimum counts only if its plateau and both neighbours are inside the window
+        acc_minima, props = signal.find_peaks(-acc_vertical, plateau_size=1)
+        order = np.searchsorted(props['left_edges'], search_start + 1)
+        acc_minima = np.append(acc_minima, -1)
+        right_edges = np.append(props['right_edges'], np.iinfo(np.int64).max)
+        minimum = np.where(right_edges[order] <= search_end - 2, acc_minima[order], -1)
+        
+        negative = first_at_or_after(np.flatnonzero(gyro_sagittal < 0), search_start)
+        
+        hs_indices = np.where(negative < search_end, negative, -1)
+        hs_indices = np.where(minimum >= 0, minimum, hs_indices)
+        hs_indices = np.where(crossing <= search_end - 2, crossing, hs_indices)
+        return np.where(search_end > search_start, hs_indices, -1)
+    
+    @staticmethod
+    def _highest_peaks(
+        gyro_sagittal: np.ndarray,
+        ms_indices: np.ndarray,
+        lo: np.ndarray,
+        hi: np.ndarray
+    ) -> np.ndarray:
+        # For every non-empty run ms_indices[lo:hi] pick the highest peak, the
+        # earliest one on ties
+        counts = hi - lo
+        if len(counts) == 0:
+            return np.zeros(0, dtype=int)
+        owner = np.repeat(np.arange(len(counts)), counts)
+        first = np.cumsum(counts) - counts
+        candidates = lo[owner] + np.arange(counts.sum()) - first[owner]
+        heights = gyro_sagittal[ms_indices[candidates]]
+        order = np.lexsort((candidates, -heights, owner))
+        return ms_indices[candidates[order[first]]]
+    
+    @staticmethod
+    def _window_peaks(x: np.ndarray, lengths: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # Rows are laid end to end with +inf right after each window, so no peak
+        # can use a neighbour outside its own window
+        n_rows, width = x.shape
+        framed = np.full((n_rows, width + 1), -np.inf)
+        framed[:, :width] = x
+        framed[np.arange(n_rows), np.maximum(lengths, 0)] = np.inf
+        framed[:, width] = np.inf
+        flat_peaks, _ = signal.find_peaks(np.concatenate([[np.inf], framed.ravel()]))
+        flat_peaks -= 1
+        flat_peaks = flat_peaks[np.isfinite(framed.ravel()[flat_peaks])]
+        return flat_peaks // (width + 1), flat_peaks % (width + 1)
     
-    def _detect_toe_off(
+    def _detect_toe_offs(
         self,
         gyro_sagittal: np.ndarray,
-        hs_idx: int,
-        ms_idx: int
-    ) -> Optional[int]:
+        hs_indices: np.ndarray,
+        ms_indices: np.ndarray
+    ) -> np.ndarray:
+        # Toe off in [max(hs, ms - window), ms): the last gyro minimum whose
+        # prominence within the window reaches to_gyro_prominence_factor times the
+        # window std, else the window's lowest sample; -1 for an empty window.
+        # Windows are at most to_search_window long, so they are evaluated as one
+        # padded (n_cycles, window) matrix.
         search_window = int(self.config.to_search_window * self.config.sampling_rate)
-        search_start = max(hs_idx, ms_idx - search_window)
-        search_end = ms_idx
-        
-        if search_end <= search_start:
-            return None
-        
-        gyro_window = gyro_sagittal[search_start:search_end]
-        
-        signal_std = np.std(gyro_window)
-        prominence_threshold = self.config.to_gyro_prominence_factor * signal_std
-        
-        minima, properties = signal.find_peaks(
-            -gyro_window,
-            prominence=prominence_threshold
-        )
-        
-        if len(minima) == 0:
-            min_idx = np.argmin(gyro_window)
-            return search_start + min_idx
-        
-        to_idx_relative = minima[-1]
-        return search_start + to_idx_relative
+        search_start = np.maximum(hs_indices, ms_indices - search_window)
+        search_end = ms_indices
+        lengths = search_end - search_start
+        to_indices = np.full(len(hs_indices), -1, dtype=int)
+        valid = lengths > 0
+        if not np.any(valid):
+            return to_indices
+        
+        width = int(lengths[valid].max())
+        offsets = np.arange(width)
+        positions = search_start[:, np.newaxis] + offsets
+        inside = valid[:, np.newaxis] & (offsets < lengths[:, np.newaxis])
+        x = np.where(inside, -gyro_sagittal[np.where(inside, positions, 0)], -np.inf)
+        
+        n_inside = np.maximum(lengths, 1)
+        mean = np.where(inside, x, 0.0).sum(axis=1) / n_inside
+        std = np.sqrt(np.where(inside, (x - mean[:, np.newaxis])**2, 0.0).sum(axis=1) / n_inside)
+        prominence_threshold = self.config.to_gyro_prominence_factor * std
+        
+        # Window-local maxima of -gyro as find_peaks sees them, flat tops included
+        rows, peaks = self._window_peaks(x, lengths)
+        
+        # Prominence inside the window: walk out from the peak until a higher sample
+        # or the window edge and take the lowest sample passed on each side
+        seg = x[rows]
+        height = seg[np.arange(len(rows)), peaks][:, np.newaxis]
+        peak = peaks[:, np.newaxis]
+        higher = seg > height
+        left_stop = np.where(higher & (offsets < peak), offsets, -1).max(axis=1)[:, np.newaxis]
+        right_stop = np.where(higher & (offsets > peak), offsets, width).min(axis=1)[:, np.newaxis]
+        left_min = np.where((offsets > left_stop) & (offsets <= peak), seg, np.inf).min(axis=1)
+        right_min = np.where((offsets >= peak) & (offsets < right_stop) & inside[rows], seg, np.inf).min(axis=1)
+        prominence = height[:, 0] - np.maximum(left_min, right_min)
+        
+        accepted = prominence >= prominence_threshold[rows]
+        last_peak = np.full(len(hs_indices), -1)
+        np.maximum.at(last_peak, rows[accepted], peaks[accepted])
+        
+        lowest = np.argmax(x, axis=1)
+        to_relative = np.where(last_peak >= 0, last_peak, lowest)
+        to_indices[valid] = (search_start + to_relative)[valid]
+        return to_indices
     
-    def _remove_outliers(self, cycles: List[GaitCycle]) -> List[GaitCycle]:
+    def _remove_outliers(self, cycles: GaitCycleTable) -> GaitCycleTable:
+        cycles = GaitCycleTable.from_cycles(cycles)
         if len(cycles) < 3:
             return cycles
         
-        durations = np.array([c.duration for c in cycles])
+        durations = cycles.duration
         
         mean_duration = np.mean(durations)
         std_duration = np.std(durations)
@@ -179,19 +241,17 @@ class StepDetector:
         
         z_scores = np.abs((durations - mean_duration) / std_duration)
         
-        valid_mask = z_scores < self.config.outlier_std_threshold
-        filtered_cycles = [c for c, valid in zip(cycles, valid_mask) if valid]
-        
-        return filtered_cycles
+        return cycles[z_scores < self.config.outlier_std_threshold]
     
-    def get_statistics(self, cycles: List[GaitCycle]) -> Dict[str, float]:
+    def get_statistics(self, cycles: GaitCycleTable) -> Dict[str, float]:
+        cycles = GaitCycleTable.from_cycles(cycles)
         if len(cycles) == 0:
             return {}
         
-        stride_times = np.array([c.stride_time for c in cycles])
-        stance_times = np.array([c.stance_time for c in cycles])
-        swing_times = np.array([c.swing_time for c in cycles])
-        cadences = np.array([c.cadence for c in cycles])
+        stride_times = cycles.stride_time
+        stance_times = cycles.stance_time
+        swing_times = cycles.swing_time
+        cadences = cycles.cadence
         
         stats = {
             'mean_stride_time': float(np.mean(stride_times)),
@@ -1,244 +1,348 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import numpy as np
 import json
-from typing import List, Dict, Any, Optional
-from scipy.interpolate import interp1d
+from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass
 import logging
-from .dclass import Metadata, StepEvent
+from .dclass import Metadata, StepEvent, GaitCycleTable
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger('GaitMetrics')
 
+KNEE_CURVE_POINTS = 100
+
+# One row per step, every column computed for all steps at once
+STEP_METRICS_DTYPE = np.dtype([
+    ('step_number', 'i4'),
+    ('hs_idx', 'i8'),
+    ('to_idx', 'i8'),
+    ('next_hs_idx', 'i8'),
+    ('step_time', 'f8'),
+    ('stance_time', 'f8'),
+    ('swing_time', 'f8'),
+    ('stance_swing_ratio', 'f8'),
+    ('knee_angle', 'f8'),
+    ('hip_angle', 'f8'),
+    ('hip_flexion_max', 'f8'),
+    ('hip_extension_min', 'f8'),
+    ('knee_flexion_max', 'f8'),
+    ('knee_extension_min', 'f8'),
+    ('knee_rom', 'f8'),
+    ('pitch', 'f8'),
+    ('roll', 'f8'),
+    ('yaw', 'f8'),
+    ('peak_angular_velocity', 'f8'),
+    ('impact_force', 'f8'),
+])
+
 def calculate_step_metrics(
     filtered_data: np.ndarray,
     orientations: np.ndarray,
     steps: List[Any], 
     fs: int = 125,
-    metadata: Metadata = None
+    metadata: Metadata = None,
+    index_offset: int = 0
 ) -> List[Dict[str, Any]]:
-    metrics_list = []
-    n_samples = len(filtered_data)
-    if isinstance(orientations, dict):
-        orientation_fields = ['thigh_pitch', 'shank_pitch', 'knee_angle']
-        if all(key in orientations for key in orientation_fields):
-            n_orient = len(orientations['knee_angle'])
-        else:
-            logger.error("Orientations должен содержать поля: thigh_pitch, shank_pitch, knee_angle")
-            return []
-    else:
-        n_orient = len(orientations)
-    
-    if n_orient != n_samples:
-        logger.warning(f"Несоответствие размеров: filtered_data={n_samples}, orientations={n_orient}")
-    
-    for step_idx, step in enumerate(steps):
-        try:
-            if hasattr(step, 'hs_idx'):
-                hs_idx = step.hs_idx
-                to_idx = step.to_idx
-                next_hs_idx = step.next_hs_idx
-            else:
-                hs_idx = step.get('hs_idx') or step.get('hs')
-                to_idx = step.get('to_idx') or step.get('to')
-                next_hs_idx = step.get('next_hs_idx') or step.get('next_hs')
-            
-            if not _validate_indices(hs_idx, to_idx, next_hs_idx, n_samples):
-                logger.warning(f"Пропуск шага {step_idx}: невалидные индексы")
-                continue
-            
-            step_metrics = _calculate_single_step_metrics(
-                filtered_data=filtered_data,
-                orientations=orientations,
-                hs_idx=hs_idx,
-                to_idx=to_idx,
-                next_hs_idx=next_hs_idx,
-                fs=fs,
-                step_number=step_idx + 1,
-                metadata=metadata
-            )
-            
-            metrics_list.append(step_metrics)
-            
-        except Exception as e:
-            logger.error(f"Ошибка при обработке шага {step_idx}: {e}")
-            continue
-    
+    table, knee_curves = calculate_step_metrics_columns(
+        filtered_data, orientations, steps, fs, index_offset
+    )
+    metrics_list = step_metrics_to_dicts(table, knee_curves, fs, metadata)
     logger.info(f"Успешно обработано {len(metrics_list)} из {len(steps)} шагов")
     return metrics_list
 
 
-def _validate_indices(
-    hs_idx: int,
-    to_idx: int,
-    next_hs_idx: int,
-    n_samples: int
-) -> bool:
-    if hs_idx is None or to_idx is None or next_hs_idx is None:
-        return False
-
-    try:
-        hs_idx = int(hs_idx)
-        to_idx = int(to_idx)
-        next_hs_idx = int(next_hs_idx)
-    except (ValueError, TypeError):
-        return False
-    
-    if hs_idx < 0 or next_hs_idx >= n_samples:
-        return False
-  
-    if not (hs_idx < to_idx < next_hs_idx):
-        return False
-   
-    if (next_hs_idx - hs_idx) < 10: 
-        return False
-    
-    return True
+def calculate_step_metrics_columns(
+    filtered_data: np.ndarray,
+    orientations: Any,
+    steps: Any,
+    fs: int = 125,
+    index_offset: int = 0
+) -> Tuple[np.ndarray, np.ndarray]:
+    # Canonical step output: the metrics table and the (n_steps, 100) float32
+    # matrix of time-normalised knee curves, row for row
+    table = calculate_step_metrics_table(filtered_data, orientations, steps, fs, index_offset)
+    if len(table) == 0:
+        return table, np.zeros((0, KNEE_CURVE_POINTS), dtype=np.float32)
+    knee_curves = normalize_curves(
+        _orientation_column(orientations, 'knee_angle'),
+        table['hs_idx'] - index_offset,
+        table['next_hs_idx'] - index_offset
+    )
+    return table, knee_curves
+
+
+def step_metrics_to_dicts(
+    table: np.ndarray,
+    knee_curves: np.ndarray,
+    fs: int = 125,
+    metadata: Metadata = None
+) -> List[Dict[str, Any]]:
+    # Row dicts for the database and API; the only place curves become JSON
+    curves = np.round(knee_curves.astype(float), 3).tolist()
+    return [
+        _step_metrics_dict(row, fs, metadata, json.dumps(curve))
+        for row, curve in zip(table, curves)
+    ]
+
 
+# step_metrics table columns in the order step_metrics_records fills them, with
+# the decimals each is stored at (as in the row dicts)
+STEP_METRICS_COLUMNS = (
+    'session_id', 'timestamp', 'step_number',
+    'roll', 'pitch', 'yaw', 'knee_angle', 'hip_angle',
+    'stance_time', 'swing_time', 'stance_swing_ratio', 'step_time',
+    'knee_flexion_max', 'knee_extension_min', 'knee_rom',
+    'hip_flexion_max', 'hip_extension_min',
+    'peak_angular_velocity', 'impact_force', 'knee_curve_json',
+)
+STEP_METRICS_DECIMALS = {
+    'roll': 2, 'pitch': 2, 'yaw': 2, 'knee_angle': 2, 'hip_angle': 2,
+    'stance_time': 4, 'swing_time': 4, 'stance_swing_ratio': 3, 'step_time': 4,
+    'knee_flexion_max': 2, 'knee_extension_min': 2, 'knee_rom': 2,
+    'hip_flexion_max': 2, 'hip_extension_min': 2,
+    'peak_angular_velocity': 2, 'impact_force': 2,
+}
+
+
+def step_metrics_records(
+    table: np.ndarray,
+    knee_curves: np.ndarray,
+    session_id: int,
+    start_time: datetime,
+    fs: int = 125
+) -> List[tuple]:
+    # Rows for a bulk write into step_metrics, one tuple per step in
+    # STEP_METRICS_COLUMNS order; timestamps are naive UTC like the column
+    if len(table) == 0:
+        return []
+    if start_time.tzinfo is not None:
+        start_time = start_time.astimezone(timezone.utc).replace(tzinfo=None)
+    offsets = np.rint(table['hs_idx'] * (1e6 / fs)).astype('timedelta64[us]')
+    columns = {
+        'session_id': [session_id] * len(table),
+        'timestamp': (np.datetime64(start_time, 'us') + offsets).tolist(),
+        'step_number': table['step_number'].tolist(),
+        'knee_curve_json': [json.dumps(curve) for curve in np.round(knee_curves.astype(float), 3).tolist()],
+    }
+    for name, decimals in STEP_METRICS_DECIMALS.items():
+        columns[name] = np.round(table[name], decimals).tolist()
+    return list(zip(*(columns[name] for name in STEP_METRICS_COLUMNS)))
+
+
+def step_metrics_from_dicts(metrics_list: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    # Inverse of step_metrics_to_dicts for rows that arrive as dicts; absent values are zero
+    table = np.zeros(len(metrics_list), dtype=STEP_METRICS_DTYPE)
+    knee_curves = np.zeros((len(metrics_list), KNEE_CURVE_POINTS), dtype=np.float32)
+    for name in STEP_METRICS_DTYPE.names:
+        table[name] = [m.get(name) or 0 for m in metrics_list]
+    for i, m in enumerate(metrics_list):
+        curve = m.get('knee_curve_json')
+        if isinstance(curve, str):
+            try:
+                curve = json.loads(curve)
+            except ValueError:
+                curve = None
+        if curve is not None and len(curve) == KNEE_CURVE_POINTS:
+            knee_curves[i] = curve
+    return table, knee_curves
+
+
+def ensemble_curve(knee_curves: np.ndarray) -> Dict[str, List[float]]:
+    # Mean and spread of the normalised knee curve across steps, per gait-cycle percent
+    if len(knee_curves) == 0:
+        return {'mean': [], 'std': []}
+    curves = knee_curves.astype(float)
+    return {
+        'mean': np.round(curves.mean(axis=0), 3).tolist(),
+        'std': np.round(curves.std(axis=0), 3).tolist(),
+    }
 
-def _calculate_single_step_metrics(
+
+def calculate_step_metrics_table(
     filtered_data: np.ndarray,
     orientations: Any,
-    hs_idx: int,
-    to_idx: int,
-    next_hs_idx: int,
-    fs: int,
-    step_number: int,
-    metadata: Metadata = None
-) -> Dict[str, Any]:
+    steps: Any,
+    fs: int = 125,
+    index_offset: int = 0
+) -> np.ndarray:
+    # Per-step metrics for every valid step in one pass: each statistic is a
+    # ufunc.reduceat over the [hs, to), [to, next_hs) or [hs, next_hs) ranges
+    n_samples = len(filtered_data)
+    knee_angle_full = _orientation_column(orientations, 'knee_angle')
+    if knee_angle_full is None or _orientation_column(orientations, 'thigh_pitch') is None \
+            or _orientation_column(orientations, 'shank_pitch') is None:
+        logger.error("Orientations должен содержать поля: thigh_pitch, shank_pitch, knee_angle")
+        return np.zeros(0, dtype=STEP_METRICS_DTYPE)
+    
+    n_orient = len(knee_angle_full)
+    if n_orient != n_samples:
+        logger.warning(f"Несоответствие размеров: filtered_data={n_samples}, orientations={n_orient}")
     
-    time_offset = hs_idx / fs
-    step_timestamp = metadata.start_time + timedelta(seconds=time_offset)
+    hs_idx, to_idx, next_hs_idx = _step_indices(steps)
+    valid = (
+        (hs_idx >= 0) & (next_hs_idx < min(n_samples, n_orient)) &
+        (hs_idx < to_idx) & (to_idx < next_hs_idx) &
+        (next_hs_idx - hs_idx >= 10)
+    )
+    for step_idx in np.flatnonzero(~valid):
+        logger.warning(f"Пропуск шага {step_idx}: невалидные индексы")
+    
+    step_number = np.flatnonzero(valid) + 1
+    hs_idx, to_idx, next_hs_idx = hs_idx[valid], to_idx[valid], next_hs_idx[valid]
+    table = np.zeros(len(hs_idx), dtype=STEP_METRICS_DTYPE)
+    if len(table) == 0:
+        return table
     
     step_time = (next_hs_idx - hs_idx) / fs
     stance_time = (to_idx - hs_idx) / fs
     swing_time = (next_hs_idx - to_idx) / fs
     
-    if isinstance(orientations, dict):
-        knee_angle_full = orientations['knee_angle']
-        thigh_pitch_full = orientations.get('thigh_pitch', np.zeros_like(knee_angle_full))
-        shank_pitch_full = orientations.get('shank_pitch', np.zeros_like(knee_angle_full))
-
-        thigh_roll_full = orientations.get('thigh_roll', np.zeros_like(knee_angle_full))
-        thigh_yaw_full = orientations.get('thigh_yaw', np.zeros_like(knee_angle_full))
-        shank_roll_full = orientations.get('shank_roll', np.zeros_like(knee_angle_full))
-        shank_yaw_full = orientations.get('shank_yaw', np.zeros_like(knee_angle_full))
-    else:
-        knee_angle_full = orientations['knee_angle']
-        thigh_pitch_full = orientations['thigh_pitch']
-        shank_pitch_full = orientations['shank_pitch']
-
-        thigh_roll_full = orientations['thigh_roll'] if 'thigh_roll' in orientations.dtype.names else np.zeros_like(knee_angle_full)
-        thigh_yaw_full = orientations['thigh_yaw'] if 'thigh_yaw' in orientations.dtype.names else np.zeros_like(knee_angle_full)
-        shank_roll_full = orientations['shank_roll'] if 'shank_roll' in orientations.dtype.names else np.zeros_like(knee_angle_full)
-        shank_yaw_full = orientations['shank_yaw'] if 'shank_yaw' in orientations.dtype.names else np.zeros_like(knee_angle_full)
-    
-    knee_angle_step = knee_angle_full[hs_idx:next_hs_idx]
-    
-    stance_indices = slice(hs_idx, to_idx)
-    swing_indices = slice(to_idx, next_hs_idx)
+    knee_angle = knee_angle_full.astype(float)
+    thigh_pitch = _orientation_column(orientations, 'thigh_pitch').astype(float)
+    shank_pitch = _orientation_column(orientations, 'shank_pitch').astype(float)
     
-    knee_angle_stance = knee_angle_full[stance_indices]
-    knee_angle_swing = knee_angle_full[swing_indices]
-
-    if len(knee_angle_swing) > 0:
-        knee_flexion_max = float(np.max(knee_angle_swing))
-    else:
-        knee_flexion_max = float(np.max(knee_angle_step)) if len(knee_angle_step) > 0 else 0.0
+    table['step_number'] = step_number
+    table['hs_idx'] = hs_idx + index_offset
+    table['to_idx'] = to_idx + index_offset
+    table['next_hs_idx'] = next_hs_idx + index_offset
+    table['step_time'] = step_time
+    table['stance_time'] = stance_time
+    table['swing_time'] = swing_time
+    table['stance_swing_ratio'] = stance_time / swing_time
     
-
-    if len(knee_angle_stance) > 0:
-        knee_extension_min = float(np.min(knee_angle_stance))
-    else:
-        knee_extension_min = float(np.min(knee_angle_step)) if len(knee_angle_step) > 0 else 0.0
+    table['knee_angle'] = _range_mean(knee_angle, hs_idx, next_hs_idx)
+    table['hip_angle'] = _range_mean(thigh_pitch, hs_idx, next_hs_idx)
+    table['hip_flexion_max'] = _range_reduce(np.maximum, thigh_pitch, hs_idx, next_hs_idx)
+    table['hip_extension_min'] = _range_reduce(np.minimum, thigh_pitch, hs_idx, next_hs_idx)
     
-    knee_rom = knee_flexion_max - knee_extension_min
+    table['knee_flexion_max'] = _range_reduce(np.maximum, knee_angle, to_idx, next_hs_idx)
+    table['knee_extension_min'] = _range_reduce(np.minimum, knee_angle, hs_idx, to_idx)
+    table['knee_rom'] = table['knee_flexion_max'] - table['knee_extension_min']
     
-    shank_pitch_stance = shank_pitch_full[stance_indices]
-    shank_roll_stance = shank_roll_full[stance_indices]
-    shank_yaw_stance = shank_yaw_full[stance_indices]
+    table['pitch'] = _range_mean(shank_pitch, hs_idx, to_idx)
+    # Roll and yaw are optional; missing ones stay at zero
+    for field, column in (('roll', 'shank_roll'), ('yaw', 'shank_yaw')):
+        values = _orientation_column(orientations, column)
+        if values is not None:
+            table[field] = _range_mean(values.astype(float), hs_idx, to_idx)
     
-    if len(shank_pitch_stance) > 0:
-        pitch_mean = float(np.mean(shank_pitch_stance))
-        roll_mean = float(np.mean(shank_roll_stance))
-        yaw_mean = float(np.mean(shank_yaw_stance))
-    else:
-        pitch_mean = 0.0
-        roll_mean = 0.0
-        yaw_mean = 0.0
+    gyro_shank_sagittal = np.abs(filtered_data['gyro2'][:, 1].astype(float))
+    table['peak_angular_velocity'] = _range_reduce(np.maximum, gyro_shank_sagittal, hs_idx, next_hs_idx)
+    acc_vertical = np.abs(filtered_data['acc2'][:, 2].astype(float))
+    table['impact_force'] = _range_reduce(np.maximum, acc_vertical, hs_idx, np.minimum(hs_idx + 10, next_hs_idx))
     
-    knee_curve_normalized = _normalize_to_100_points(knee_angle_step)
-    knee_curve_json = json.dumps(knee_curve_normalized)
+    return table
 
-    knee_ang = orientations['knee_angle'][hs_idx:next_hs_idx]
-    hip_ang = orientations['thigh_pitch'][hs_idx:next_hs_idx]
 
-    thigh_pitch_step = thigh_pitch_full[hs_idx:next_hs_idx]
-    if len(thigh_pitch_step) > 0:
-        thigh_flexion_max = float(np.max(thigh_pitch_step))
-        thigh_extension_min = float(np.min(thigh_pitch_step))
-    else:
-        thigh_flexion_max = thigh_extension_min = 0.0
+def _orientation_column(orientations: Any, name: str) -> Optional[np.ndarray]:
+    if isinstance(orientations, dict):
+        return orientations.get(name)
+    if name in orientations.dtype.names:
+        return orientations[name]
+    return None
 
 
-    gyro_shank_sagittal = filtered_data['gyro2'][hs_idx:next_hs_idx, 1] 
-    peak_angular_velocity = float(np.max(np.abs(gyro_shank_sagittal))) if len(gyro_shank_sagittal) > 0 else 0.0
+def _step_indices(steps: Any):
+    if isinstance(steps, GaitCycleTable):
+        return (np.asarray(steps.hs_idx, dtype=np.int64),
+                np.asarray(steps.to_idx, dtype=np.int64),
+                np.asarray(steps.next_hs_idx, dtype=np.int64))
     
-    acc_vertical = filtered_data['acc2'][hs_idx:min(hs_idx+10, next_hs_idx), 2] 
-    impact_force = float(np.max(np.abs(acc_vertical))) if len(acc_vertical) > 0 else 0.0
+    indices = np.full((len(steps), 3), -1, dtype=np.int64)
+    for step_idx, step in enumerate(steps):
+        if hasattr(step, 'hs_idx'):
+            hs_idx, to_idx, next_hs_idx = step.hs_idx, step.to_idx, step.next_hs_idx
+        else:
+            hs_idx = step.get('hs_idx') or step.get('hs')
+            to_idx = step.get('to_idx') or step.get('to')
+            next_hs_idx = step.get('next_hs_idx') or step.get('next_hs')
+        try:
+            indices[step_idx] = [int(hs_idx), int(to_idx), int(next_hs_idx)]
+        except (ValueError, TypeError):
+            continue
+    return indices[:, 0], indices[:, 1], indices[:, 2]
+
+
+def _range_reduce(ufunc: np.ufunc, values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    # Reduce values[starts[i]:ends[i]] for every i; ranges must be non-empty and
+    # end before len(values). Interleaving starts and ends makes every even
+    # reduceat slot exactly one range, whatever the ranges overlap.
+    bounds = np.empty(2 * len(starts), dtype=np.intp)
+    bounds[0::2] = starts
+    bounds[1::2] = ends
+    return ufunc.reduceat(values, bounds)[0::2]
+
+
+def _range_mean(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    return _range_reduce(np.add, values, starts, ends) / (ends - starts)
+
+
+def _step_metrics_dict(
+    row: np.void,
+    fs: int,
+    metadata: Optional[Metadata],
+    knee_curve_json: str
+) -> Dict[str, Any]:
+    step_timestamp = None
+    if metadata is not None:
+        step_timestamp = (metadata.start_time + timedelta(seconds=int(row['hs_idx']) / fs)).isoformat()
     
-    metrics = {
+    return {
         'session_id': metadata.session_id if metadata else None,
-        'timestamp': step_timestamp.isoformat(),
-        'hs_idx': hs_idx,
-        'next_hs_idx': next_hs_idx,
-        'step_number': step_number,
-        'step_time': round(step_time, 4),
-        'knee_angle': round(float(np.mean(knee_ang)), 2),
-        'hip_angle': round(float(np.mean(hip_ang)), 2),
-        "hip_flexion_max": round(thigh_flexion_max, 2),
-        "hip_extension_min": round(thigh_extension_min, 2),
-        'stance_time': round(stance_time, 4),
-        'swing_time': round(swing_time, 4),
-        'stance_swing_ratio': round(stance_time / swing_time, 3) if swing_time > 0 else 0,
-        'knee_flexion_max': round(knee_flexion_max, 2),
-        'knee_extension_min': round(knee_extension_min, 2),
-        'knee_rom': round(knee_rom, 2),
-        'pitch': round(pitch_mean, 2),
-        'roll': round(roll_mean, 2),
-        'yaw': round(yaw_mean, 2),
+        'timestamp': step_timestamp,
+        'hs_idx': int(row['hs_idx']),
+        'next_hs_idx': int(row['next_hs_idx']),
+        'step_number': int(row['step_number']),
+        'step_time': round(float(row['step_time']), 4),
+        'knee_angle': round(float(row['knee_angle']), 2),
+        'hip_angle': round(float(row['hip_angle']), 2),
+        "hip_flexion_max": round(float(row['hip_flexion_max']), 2),
+        "hip_extension_min": round(float(row['hip_extension_min']), 2),
+        'stance_time': round(float(row['stance_time']), 4),
+        'swing_time': round(float(row['swing_time']), 4),
+        'stance_swing_ratio': round(float(row['stance_swing_ratio']), 3),
+        'knee_flexion_max': round(float(row['knee_flexion_max']), 2),
+        'knee_extension_min': round(float(row['knee_extension_min']), 2),
+        'knee_rom': round(float(row['knee_rom']), 2),
+        'pitch': round(float(row['pitch']), 2),
+        'roll': round(float(row['roll']), 2),
+        'yaw': round(float(row['yaw']), 2),
         'knee_curve_json': knee_curve_json,
-        'peak_angular_velocity': round(peak_angular_velocity, 2),
-        'impact_force': round(impact_force, 2),
+        'peak_angular_velocity': round(float(row['peak_angular_velocity']), 2),
+        'impact_force': round(float(row['impact_force']), 2),
     }
-    
-    return metrics
 
 
-def _normalize_to_100_points(signal: np.ndarray) -> List[float]:
-    if len(signal) == 0:
-        return [0.0] * 100
+def normalize_curves(
+    values: np.ndarray,
+    starts: np.ndarray,
+    ends: np.ndarray,
+    n_points: int = KNEE_CURVE_POINTS
+) -> np.ndarray:
+    # Linear resampling of every values[starts[i]:ends[i]] onto n_points evenly
+    # spaced points at once, as interp1d over linspace(0, 100, length) did per step
+    starts = np.asarray(starts, dtype=np.intp)
+    lengths = np.asarray(ends, dtype=np.intp) - starts
+    curves = np.zeros((len(starts), n_points), dtype=np.float32)
+    filled = lengths > 0
+    if not np.any(filled):
+        return curves
+    starts, lengths = starts[filled], lengths[filled]
     
-    if len(signal) == 1:
-        return [float(signal[0])] * 100
-    original_time = np.linspace(0, 100, len(signal))
-    target_time = np.linspace(0, 100, 100)
+    position = np.linspace(0.0, 1.0, n_points)[np.newaxis, :] * (lengths - 1)[:, np.newaxis]
+    left = np.minimum(np.floor(position).astype(np.intp), np.maximum(lengths - 2, 0)[:, np.newaxis])
+    fraction = position - left
+    left += starts[:, np.newaxis]
+    right = np.minimum(left + 1, (starts + lengths - 1)[:, np.newaxis])
     
-    try:
-        interpolator = interp1d(
-            original_time,
-            signal,
-            kind='linear',
-            bounds_error=False,
-            fill_value='extrapolate'
-        )
-        
-        normalized = interpolator(target_time)
-        return [round(float(x), 3) for x in normalized]
-        
-    except Exception as e:
-        logger.warning(f"Ошибка интерполяции: {e}, возвращаем нули")
-        return [0.0] * 100
+    x0 = values[left].astype(float)
+    curves[filled] = x0 + (values[right] - x0) * fraction
+    return curves
+
+
+def _normalize_to_100_points(signal: np.ndarray) -> List[float]:
+    curve = normalize_curves(np.asarray(signal), [0], [len(signal)])[0]
+    return np.round(curve.astype(float), 3).tolist()
     
 
 
@@ -0,0 +1,53 @@
+import json
+from typing import List, Sequence
+from sqlalchemy import delete, insert, select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.data.tables import StepMetrics
+from .step_pro import STEP_METRICS_COLUMNS
+
+step_metrics = StepMetrics.__table__
+
+async def write_step_metrics(
+    db: AsyncSession,
+    session_id: int,
+    records: Sequence[tuple],
+    batch_size: int = 5000
+) -> int:
+    # Replaces the session's rows in step_metrics with `records` (from
+    # step_pro.step_metrics_records) inside the caller's transaction, so the
+    # steps and the walking_sessions summary commit or roll back together.
+    # On asyncpg the rows go in with one binary COPY; other drivers get
+    # batched executemany INSERTs. ids come from the identity column where
+    # the database has one, and are numbered here otherwise (SQLite).
+    await db.execute(delete(step_metrics).where(step_metrics.c.session_id == session_id))
+    if not records:
+        return 0
+
+    conn = await db.connection()
+    raw = await conn.get_raw_connection()
+    driver = raw.driver_connection
+    if hasattr(driver, 'copy_records_to_table'):
+        await driver.copy_records_to_table(
+            step_metrics.name,
+            records=records,
+            columns=list(STEP_METRICS_COLUMNS)
+        )
+        return len(records)
+
+    curve = STEP_METRICS_COLUMNS.index('knee_curve_json')
+    next_id = None
+    if not conn.dialect.supports_identity_columns:
+        # The delete above already holds SQLite's write lock, so nobody else can take these ids
+        next_id = (await conn.execute(select(func.coalesce(func.max(step_metrics.c.id), 0)))).scalar_one() + 1
+    for start in range(0, len(records), batch_size):
+        rows: List[dict] = []
+        for r in records[start:start + batch_size]:
+            row = dict(zip(STEP_METRICS_COLUMNS, r))
+            # The JSON column type serialises for itself
+            row['knee_curve_json'] = json.loads(r[curve])
+            if next_id is not None:
+                row['id'] = next_id
+                next_id += 1
+            rows.append(row)
+        await conn.execute(insert(step_metrics), rows)
+    return len(records)
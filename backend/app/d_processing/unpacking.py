@@ -1,12 +1,40 @@
 import numpy as np
-def unpack_bin(file_path):
-    dt = np.dtype([
-        ('header', 'u1'),
-        ('timestamp', 'f8'),
-        ('acc1',      'f4', (3,)), # x, y, z thigh 
-        ('gyro1',     'f4', (3,)), # x, y, z
-        ('acc2',      'f4', (3,)), # x, y, z shin
-        ('gyro2',     'f4', (3,))  # x, y, z
-    ])
-    data = np.fromfile(file_path, dtype=dt)
-    return data
\ No newline at end of file
+from typing import Dict
+
+BIN_DTYPE = np.dtype([
+    ('header', 'u1'),
+    ('timestamp', 'f8'),
+    ('acc1',      'f4', (3,)), # x, y, z thigh
+    ('gyro1',     'f4', (3,)), # x, y, z
+    ('acc2',      'f4', (3,)), # x, y, z shin
+    ('gyro2',     'f4', (3,))  # x, y, z
+])
+SENSOR_FIELDS = ('acc1', 'gyro1', 'acc2', 'gyro2')
+
+def unpack_bin(file_path, mmap: bool = False, columnar: bool = False):
+    if mmap:
+        data = open_bin(file_path)
+    else:
+        data = np.fromfile(file_path, dtype=BIN_DTYPE)
+    if columnar:
+        return unpack_to_soa(data)
+    return data
+
+def open_bin(file_path) -> np.ndarray:
+    # Read-only mapping: the records stay on disk and slices are paged in on access
+    return np.memmap(file_path, dtype=BIN_DTYPE, mode='r')
+
+def unpack_bytes(buffer) -> np.ndarray:
+    # Zero-copy read-only view over an in-memory upload; a trailing partial record is ignored
+    count = len(buffer) // BIN_DTYPE.itemsize
+    return np.frombuffer(buffer, dtype=BIN_DTYPE, count=count)
+
+def unpack_to_soa(data: np.ndarray) -> Dict[str, np.ndarray]:
+    # Split the packed records once into contiguous columns
+    columns = {
+        'header': np.ascontiguousarray(data['header']),
+        'timestamp': np.ascontiguousarray(data['timestamp']),
+    }
+    for field in SENSOR_FIELDS:
+        columns[field] = np.ascontiguousarray(data[field], dtype=np.float32)
+    return columns
@@ -0,0 +1,180 @@
+import numpy as np
+from typing import Tuple
+from scipy import signal
+from scipy.ndimage import maximum_filter1d
+from numpy.lib.stride_tricks import sliding_window_view
+from .dclass import ACTIVITY_FEATURES_DTYPE, DetectionConfig
+
+# Per-sample channels summed over windows: |acc| thigh, |acc| shank,
+# SMA term thigh, SMA term shank, vertical shank acceleration
+MAG_THIGH, MAG_SHANK, SMA_THIGH, SMA_SHANK, VERTICAL = range(5)
+N_CHANNELS = 5
+
+class WindowFeatureEngine:
+    # Window statistics as differences of running sums: a window's mean, variance
+    # and SMA cost O(1) whatever its length or overlap, and the sums carry over
+    # between push() calls, so a recording can arrive in pieces of any size.
+    #
+    # spectral_method "fft" runs a batched rfft under the symmetric Hanning taper.
+    # "sliding" keeps running sums of x[n]·e^(-j2πkn/W) for the analysis-band bins
+    # only and applies a periodic Hann as the 3-tap kernel (-1/4, 1/2, -1/4) in
+    # the frequency domain, so each window costs O(band bins) as well.
+    def __init__(self, config: DetectionConfig, spectral_plan: Tuple[np.ndarray, np.ndarray, np.ndarray]):
+        self.config = config
+        self.window_samples = int(config.window_size * config.sampling_rate)
+        self.step_samples = int((config.window_size - config.window_overlap) * config.sampling_rate)
+        if self.spectral_method not in ("fft", "sliding"):
+            raise ValueError(f"Unknown spectral method: {config.spectral_method}")
+
+        self.window, freq_mask, self.band_freqs = spectral_plan
+        self.band_bins = np.flatnonzero(freq_mask)
+        # Band bins plus their neighbours for the Hann kernel; bin 0 comes from the window sum
+        self._dft_bins = np.union1d(self.band_bins - 1, self.band_bins + 1)
+        self._dft_bins = np.union1d(self._dft_bins, self.band_bins)
+        self._dft_bins = self._dft_bins[self._dft_bins > 0]
+        # e^(-j2πkn/W) over one period of n
+        period = max(self.window_samples, 1)
+        self._twiddle = np.exp(-2j * np.pi * np.outer(self._dft_bins, np.arange(period)) / period)
+        self.reset()
+
+    @property
+    def spectral_method(self) -> str:
+        return self.config.spectral_method
+
+    def reset(self):
+        self.n_samples = 0
+        self.next_start = 0  # global index of the next window to emit
+        self._offset = None  # first sample, subtracted before summing to keep the sums small
+        # Everything from next_start on, channel-major so each running sum is a
+        # contiguous cumsum; the sums have one extra leading column, the total
+        # before next_start
+        self._channels = np.zeros((N_CHANNELS, 0))
+        self._timestamps = np.zeros(0)
+        self._sums = np.zeros((2 * N_CHANNELS, 1))
+        self._dft_sums = np.zeros((2, len(self._dft_bins), 1), dtype=complex)
+
+    def push(self, data: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # Returns start times, end times and the feature rows of every window
+        # completed by these samples
+        if len(data) > 0:
+            self._append(data)
+
+        W = self.window_samples
+        base = self.n_samples - len(self._timestamps)
+        if W <= 0 or self.n_samples - W < self.next_start:
+            return np.zeros(0), np.zeros(0), np.zeros(0, dtype=ACTIVITY_FEATURES_DTYPE)
+
+        starts = np.arange(self.next_start, self.n_samples - W + 1, self.step_samples)
+        local = starts - base
+        table = self._features(starts, local)
+        start_times = self._timestamps[local]
+        end_times = self._timestamps[local + W - 1]
+
+        self.next_start = int(starts[-1]) + self.step_samples
+        keep = min(self.next_start - base, len(self._timestamps))
+        self._channels = self._channels[:, keep:]
+        self._timestamps = self._timestamps[keep:]
+        self._sums = self._sums[:, keep:]
+        self._dft_sums = self._dft_sums[..., keep:]
+        return start_times, end_times, table
+
+    def _append(self, data: np.ndarray):
+        acc_thigh = data['acc1'].astype(float)
+        acc_shank = data['acc2'].astype(float)
+        channels = np.empty((N_CHANNELS, len(data)))
+        channels[MAG_THIGH] = np.sqrt(np.einsum('ij,ij->i', acc_thigh, acc_thigh))
+        channels[MAG_SHANK] = np.sqrt(np.einsum('ij,ij->i', acc_shank, acc_shank))
+        channels[SMA_THIGH] = np.abs(acc_thigh).sum(axis=1)
+        channels[SMA_SHANK] = np.abs(acc_shank).sum(axis=1)
+        channels[VERTICAL] = acc_shank[:, 2]
+        if self._offset is None:
+            self._offset = channels[:, :1].copy()
+
+        centered = channels - self._offset
+        sums = np.concatenate([centered, centered**2])
+        np.cumsum(sums, axis=1, out=sums)
+        sums += self._sums[:, -1:]
+
+        if self.spectral_method == "sliding":
+            # Phases use n mod W, which is exact because every bin index is an integer
+            n = (self.n_samples + np.arange(len(data))) % self.window_samples
+            terms = centered[[MAG_THIGH, MAG_SHANK], np.newaxis, :] * self._twiddle[np.newaxis, :, n]
+            np.cumsum(terms, axis=2, out=terms)
+            terms += self._dft_sums[..., -1:]
+            self._dft_sums = np.concatenate([self._dft_sums, terms], axis=2)
+
+        self._channels = np.concatenate([self._channels, channels], axis=1)
+        self._timestamps = np.concatenate([self._timestamps, data['timestamp'].astype(float)])
+        self._sums = np.concatenate([self._sums, sums], axis=1)
+        self.n_samples += len(data)
+
+    def _features(self, starts: np.ndarray, local: np.ndarray) -> np.ndarray:
+        W = self.window_samples
+        window_sums = (self._sums[:, local + W] - self._sums[:, local]) / W
+        mean = window_sums[:N_CHANNELS]
+        var = np.maximum(window_sums[N_CHANNELS:] - mean**2, 0.0)
+        mean = mean + self._offset
+
+        table = np.empty(len(starts), dtype=ACTIVITY_FEATURES_DTYPE)
+        table['sma_thigh'] = mean[SMA_THIGH]
+        table['sma_shank'] = mean[SMA_SHANK]
+        table['mag_mean_thigh'] = mean[MAG_THIGH]
+        table['mag_mean_shank'] = mean[MAG_SHANK]
+        table['mag_std_thigh'] = np.sqrt(var[MAG_THIGH])
+        table['mag_std_shank'] = np.sqrt(var[MAG_SHANK])
+        table['mag_ratio'] = mean[MAG_SHANK] / (mean[MAG_THIGH] + 1e-6)
+        table['vertical_variance'] = var[VERTICAL]
+
+        if self.spectral_method == "sliding":
+            power_thigh, power_shank = self._sliding_band_power(starts, local, mean)
+        else:
+            power_thigh, power_shank = (
+                np.abs(np.fft.rfft(self._windows(channel, local) * self.window, axis=1)[:, self.band_bins])**2
+                for channel in (MAG_THIGH, MAG_SHANK)
+            )
+
+        for name, power in (('thigh', power_thigh), ('shank', power_shank)):
+            if len(self.band_bins) == 0:
+                table[f'spectral_energy_{name}'] = 0.0
+                table[f'dominant_freq_{name}'] = 0.0
+            else:
+                table[f'spectral_energy_{name}'] = power.sum(axis=1)
+                table[f'dominant_freq_{name}'] = self.band_freqs[np.argmax(power, axis=1)]
+        table['cadence'] = table['dominant_freq_shank'] * 60 * 2
+        table['peak_count_shank'] = self._peak_counts(local)
+        return table
+
+    def _windows(self, channel: int, local: np.ndarray) -> np.ndarray:
+        return sliding_window_view(self._channels[channel], self.window_samples)[local]
+
+    def _sliding_band_power(self, starts, local, mean):
+        W = self.window_samples
+        shift = np.exp(2j * np.pi * np.outer(starts % W, self._dft_bins) / W)
+        spectra = []
+        for k, channel in enumerate((MAG_THIGH, MAG_SHANK)):
+            # Full DFT values for bins 0.._dft_bins.max(); only the needed ones are filled
+            X = np.zeros((len(starts), self._dft_bins.max() + 2), dtype=complex)
+            X[:, self._dft_bins] = (self._dft_sums[k][:, local + W] - self._dft_sums[k][:, local]).T * shift
+            X[:, 0] = mean[channel] * W
+            hann = 0.5 * X[:, self.band_bins] - 0.25 * (X[:, self.band_bins - 1] + X[:, self.band_bins + 1])
+            spectra.append(np.abs(hann)**2)
+        return spectra
+
+    def _peak_counts(self, local: np.ndarray) -> np.ndarray:
+        # Peaks can only exist where the window reaches the height threshold,
+        # so find_peaks runs on those few windows only
+        W = self.window_samples
+        mag_shank = self._channels[MAG_SHANK]
+        peak_height = self.config.jumping_peak_threshold * 9.81
+        # Running maximum over [s, s + W) in O(1) per sample
+        window_max = maximum_filter1d(mag_shank, W, origin=-(W // 2))[local]
+
+        counts = np.zeros(len(local), dtype=int)
+        for i in np.flatnonzero(window_max >= peak_height):
+            peaks, _ = signal.find_peaks(
+                mag_shank[local[i]:local[i] + W],
+                height=peak_height,
+                distance=int(self.config.sampling_rate * 0.2)
+            )
+            counts[i] = len(peaks)
+        return counts
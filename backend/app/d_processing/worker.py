@@ -0,0 +1,187 @@
+# Standalone session processor; run from backend/: python -m app.d_processing.worker
+# Start as many as needed, on any machine that sees the database and RAW_STORAGE.
+import os
+import asyncio
+import argparse
+import logging
+import socket
+from typing import Optional
+from sqlalchemy import select, update
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession, AsyncEngine
+from app.data.tables import WalkingSessions, Profiles
+from app.data.db_settings import get_background_engine, get_background_sessions, dispose_background_engine, pool_metrics
+from .dclass import Metadata
+from .jobs import JobQueue
+from .pool import ProcessingPool
+from .raw_store import load_raw
+from .session_pro import session_summary_values
+from .step_store import write_step_metrics
+from .progress import refresh_user_progress
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('SessionWorker')
+
+sessions = WalkingSessions.__table__
+profiles = Profiles.__table__
+
+async def load_session_metadata(db: AsyncSession, session_id: int) -> Optional[Metadata]:
+    session = (await db.execute(
+        select(sessions, profiles.c.height)
+        .select_from(sessions.outerjoin(profiles, profiles.c.id == sessions.c.user_id))
+        .where(sessions.c.id == session_id)
+    )).one_or_none()
+    if session is None:
+        return None
+    return Metadata(
+        start_time=session.start_time,
+        height=session.height,
+        user_notes=session.notes,
+        is_baseline=session.is_baseline,
+        user_id=session.user_id,
+        session_id=session.id
+    )
+
+
+class SessionWorker:
+    # Claims jobs from the queue and runs them on a ProcessingPool, keeping at
+    # most pool.max_workers in flight; each job's lease is renewed while it runs.
+    def __init__(
+        self,
+        queue: JobQueue,
+        pool: ProcessingPool,
+        session_factory: async_sessionmaker,
+        worker_id: Optional[str] = None,
+        poll_interval: float = 2.0,
+        engine: Optional[AsyncEngine] = None
+    ):
+        self.queue = queue
+        self.pool = pool
+        self.session_factory = session_factory
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.poll_interval = poll_interval
+        self.engine = engine  # only for pool metrics in the log
+        self._stopping = asyncio.Event()
+
+    def stop(self):
+        self._stopping.set()
+
+    async def run(self, once: bool = False):
+        # once: exit as soon as the queue is drained
+        running = set()
+        while not self._stopping.is_set():
+            job = None
+            if len(running) < self.pool.max_workers:
+                job = await self.queue.claim(self.worker_id)
+            if job is not None:
+                running.add(asyncio.create_task(self.handle(job)))
+                continue
+            if once and not running:
+                break
+            if running:
+                done, running = await asyncio.wait(running, timeout=self.poll_interval, return_when=asyncio.FIRST_COMPLETED)
+            else:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        if running:
+            await asyncio.wait(running)
+
+    async def handle(self, job: Row):
+        lease_lost = asyncio.Event()
+        heartbeat = asyncio.create_task(self._keep_lease(job.id, lease_lost))
+        try:
+            async with self.session_factory() as db:
+                metadata = await load_session_metadata(db, job.session_id)
+            if metadata is None:
+                await self.queue.fail(job.id, self.worker_id, "Session not found", retry=False)
+                return
+
+            raw_data = await asyncio.to_thread(load_raw, job.raw_path)
+            result = await self.pool.submit(job.id, raw_data, metadata, with_steps=True)
+            summary, records = result if isinstance(result, tuple) else (result, [])
+            if lease_lost.is_set():
+                # Another worker may own the job by now; its result is the one that counts
+                logger.warning(f"Job {job.id}: lease lost while processing, result discarded")
+                return
+
+            if isinstance(summary, str) or not summary:
+                # The pipeline's own errors are deterministic: retrying would fail the same way.
+                # Failing for good also leaves the session STOPPED
+                logger.warning(f"Session {job.session_id}: {summary or 'no steps detected'}")
+                await self.queue.fail(job.id, self.worker_id, summary or "No steps detected", retry=False)
+                return
+            # Summary, steps, the user's rollups and the job's completion land in
+            # one transaction. complete() is checked first: it only matches while
+            # we still hold the lease and locks the job row, so a worker whose
+            # lease was taken over writes nothing
+            async with self.session_factory() as db:
+                if not await self.queue.complete(job.id, self.worker_id, db=db):
+                    await db.rollback()
+                    logger.warning(f"Job {job.id}: lease lost before commit, result discarded")
+                    return
+                await db.execute(
+                    update(sessions)
+                    .where(sessions.c.id == job.session_id)
+                    .values(**session_summary_values(summary, metadata))
+                )
+                await write_step_metrics(db, job.session_id, records)
+                await refresh_user_progress(db, metadata.user_id, metadata.start_time)
+                await db.commit()
+            logger.info(f"Session {job.session_id} processed (job {job.id}, attempt {job.attempts})")
+            if self.engine is not None:
+                logger.info(f"DB pool: {pool_metrics(self.engine)}")
+
+        except Exception as e:
+            logger.exception(f"Job {job.id} for session {job.session_id} failed")
+            await self.queue.fail(job.id, self.worker_id, f"{type(e).__name__}: {e}")
+        finally:
+            heartbeat.cancel()
+
+    async def _keep_lease(self, job_id: int, lost: asyncio.Event):
+        # Renews three times per lease, so one failed renewal (e.g. a database
+        # blip) is retried before the lease runs out
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            try:
+                renewed = await self.queue.heartbeat(job_id, self.worker_id)
+            except Exception:
+                logger.exception(f"Heartbeat for job {job_id} failed, retrying")
+                continue
+            if not renewed:
+                logger.warning(f"Lost the lease on job {job_id}")
+                lost.set()
+                return
+
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description="Process uploaded walking sessions from the job queue")
+    parser.add_argument('--workers', type=int, default=int(os.getenv("PROCESSING_WORKERS", "2")), help="Sessions processed in parallel")
+    parser.add_argument('--database-url', default=os.getenv("DATABASE_URL"))
+    parser.add_argument('--lease-seconds', type=float, default=300.0)
+    parser.add_argument('--poll-interval', type=float, default=2.0)
+    parser.add_argument('--once', action='store_true', help="Exit when the queue is empty")
+    args = parser.parse_args(argv)
+
+    # Each job holds at most one connection at a time, plus claim and heartbeat queries
+    engine = get_background_engine(args.database_url, pool_size=args.workers + 2)
+    session_factory = get_background_sessions()
+    pool = ProcessingPool(max_workers=args.workers, max_queued=0)
+    pool.start()
+    worker = SessionWorker(
+        JobQueue(session_factory, lease_seconds=args.lease_seconds),
+        pool,
+        session_factory,
+        poll_interval=args.poll_interval,
+        engine=engine
+    )
+    try:
+        await worker.run(once=args.once)
+    finally:
+        pool.shutdown()
+        await dispose_background_engine()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+import os
+import time
+import threading
+from typing import Any, Dict, Optional
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine, AsyncSession
+
+class MeteredAsyncQueuePool(AsyncAdaptedQueuePool):
+    # Queue pool that also records how long checkouts wait for a connection
+    # (queueing for a free one or opening a new one) and how many time out
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._metrics_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            with self._metrics_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            wait = time.perf_counter() - start
+            with self._metrics_lock:
+                self.checkouts += 1
+                self.wait_total += wait
+                self.wait_max = max(self.wait_max, wait)
+
+    def recreate(self):
+        # Keep the counters across pool recreation (e.g. after a disconnect)
+        pool = super().recreate()
+        pool.checkouts, pool.timeouts = self.checkouts, self.timeouts
+        pool.wait_total, pool.wait_max = self.wait_total, self.wait_max
+        return pool
+
+
+def pool_metrics(engine: AsyncEngine) -> Dict[str, Any]:
+    pool = engine.pool
+    metrics = {
+        'size': pool.size(),
+        'checked_out': pool.checkedout(),
+        'checked_in': pool.checkedin(),
+        'overflow': pool.overflow(),
+    }
+    if isinstance(pool, MeteredAsyncQueuePool):
+        metrics.update({
+            'checkouts': pool.checkouts,
+            'timeouts': pool.timeouts,
+            'wait_avg_ms': round(1000 * pool.wait_total / pool.checkouts, 3) if pool.checkouts else 0.0,
+            'wait_max_ms': round(1000 * pool.wait_max, 3),
+        })
+    return metrics
+
+
+# Background processing (queue workers) gets its own engine, sized to the work
+# it runs in parallel, so a burst of jobs never competes with API requests for
+# connections and never opens an engine per job
+BACKGROUND_POOL_SIZE = int(os.getenv("BACKGROUND_POOL_SIZE", "5"))
+BACKGROUND_MAX_OVERFLOW = int(os.getenv("BACKGROUND_MAX_OVERFLOW", "5"))
+BACKGROUND_POOL_TIMEOUT = float(os.getenv("BACKGROUND_POOL_TIMEOUT", "30"))
+
+_background_engine: Optional[AsyncEngine] = None
+_background_sessions: Optional[async_sessionmaker] = None
+
+def create_background_engine(
+    url: Optional[str] = None,
+    pool_size: int = BACKGROUND_POOL_SIZE,
+    max_overflow: int = BACKGROUND_MAX_OVERFLOW
+) -> AsyncEngine:
+    return create_async_engine(
+        url or os.getenv("DATABASE_URL"),
+        poolclass=MeteredAsyncQueuePool,
+        pool_pre_ping=True,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=BACKGROUND_POOL_TIMEOUT,
+        pool_recycle=1800
+    )
+
+def get_background_engine(url: Optional[str] = None, **kwargs) -> AsyncEngine:
+    # One engine per process, created on first use
+    global _background_engine, _background_sessions
+    if _background_engine is None:
+        _background_engine = create_background_engine(url, **kwargs)
+        _background_sessions = async_sessionmaker(_background_engine, class_=AsyncSession, expire_on_commit=False)
+    return _background_engine
+
+def get_background_sessions(url: Optional[str] = None, **kwargs) -> async_sessionmaker:
+    get_background_engine(url, **kwargs)
+    return _background_sessions
+
+async def dispose_background_engine():
+    global _background_engine, _background_sessions
+    if _background_engine is not None:
+        await _background_engine.dispose()
+        _background_engine = None
+        _background_sessions = None
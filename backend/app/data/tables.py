@@ -1,7 +1,7 @@
 #imports
 from sqlalchemy import (Column, Integer,String,CheckConstraint,
                         DateTime, Float, Boolean, ForeignKey, JSON, Text, Enum as SQLEnum, text,
-                        PrimaryKeyConstraint, Index)
+                        PrimaryKeyConstraint, Index, UniqueConstraint, Identity)
 from sqlalchemy.dialects.postgresql import ARRAY
 from datetime import datetime, timezone
 from sqlalchemy.orm import declarative_base, relationship
@@ -9,6 +9,7 @@ import enum
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 import os
 from dotenv import load_dotenv
+from .db_settings import MeteredAsyncQueuePool
 from sqlalchemy.dialects.postgresql import JSONB
 
 load_dotenv()
@@ -16,6 +17,7 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 engine = create_async_engine(
     DATABASE_URL,
     echo=True,
+    poolclass=MeteredAsyncQueuePool,
     pool_pre_ping=True,
     pool_size=10,
     max_overflow=20
@@ -38,6 +40,16 @@ class SessionStatus(enum.Enum):
     PROCESSING = 'processing'
     COMPLETED = 'completed'
 
+class PeriodType(enum.Enum):
+    DAY = 'day'
+    WEEK = 'week'
+
+class JobStatus(enum.Enum):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
 class SideEnum(enum.Enum):
     LEFT = 'left'
     RIGHT = 'right'
@@ -277,6 +289,55 @@ class WalkingSessions(Base):
     user = relationship("Users", back_populates="walking_sessions")
     step_metrics = relationship("StepMetrics", back_populates="session", cascade="all, delete-orphan")
 
+class ProcessingJobs(Base):
+    __tablename__ = "processing_jobs"
+    __table_args__ = (
+        Index('idx_processing_jobs_claim', 'status', 'run_after'),
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    session_id = Column(Integer, ForeignKey("walking_sessions.id", ondelete="CASCADE"), nullable=False, index=True)
+    raw_path = Column(String(500), nullable=False, comment="Путь к сырым данным сессии")
+
+    status = Column(SQLEnum(JobStatus), nullable=False, default=JobStatus.QUEUED)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_after = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc), comment="Не брать в работу раньше")
+
+    # Lease: the worker owning a running job must renew it before it expires
+    lease_owner = Column(String(255), nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
+    updated_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
+
+class UserProgress(Base):
+    # Per-user daily/weekly rollups, refreshed by the processing worker whenever
+    # a session in the period is (re)processed; read instead of scanning steps
+    __tablename__ = "user_progress"
+    __table_args__ = (
+        UniqueConstraint('user_id', 'period_type', 'period_start', name='uq_user_progress_period'),
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("user.id", ondelete="CASCADE"), nullable=False, index=True)
+    period_type = Column(SQLEnum(PeriodType), nullable=False)
+    period_start = Column(DateTime, nullable=False, comment="Начало дня / понедельник недели")
+
+    session_count = Column(Integer, nullable=False, default=0)
+    step_count = Column(Integer, nullable=False, default=0)
+    total_duration = Column(Float, comment="Суммарная длительность (сек)")
+
+    # Cadence and speed are weighted by steps, GVI is a mean over sessions,
+    # knee ROM a mean over every step in the period
+    avg_cadence = Column(Float, comment="Каденс (шагов/мин)")
+    avg_speed = Column(Float, comment="Средняя скорость (м/с)")
+    avg_gvi = Column(Float, comment="Gait Variability Index (%)")
+    avg_knee_rom = Column(Float, comment="Средняя амплитуда колена за шаг (градусы)")
+
+    updated_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
+
+    user = relationship("Users", back_populates="progress_records")
+
 class StepMetrics(Base):
     __tablename__ = "step_metrics"
     __table_args__ = (
@@ -288,7 +349,8 @@ class StepMetrics(Base):
             }
         }
     )
-    id = Column(Integer)
+    # Filled by Postgres; id is half of the composite key, which SQLite cannot autoincrement
+    id = Column(Integer, Identity(), nullable=False)
     session_id = Column(Integer, ForeignKey("walking_sessions.id", ondelete="CASCADE"), index=True, nullable=False)
     timestamp = Column(DateTime,default=lambda: datetime.now(timezone.utc), nullable=False, index=True)
     step_number = Column(Integer, comment="Номер шага в сессии")
@@ -440,7 +502,6 @@ async def create_indexes(conn):
     indexes = [
         "CREATE INDEX IF NOT EXISTS idx_user_sessions_date ON walking_sessions(user_id, start_time DESC);",
         "CREATE INDEX IF NOT EXISTS idx_progress_period ON user_progress(user_id, period_type, period_start DESC);",
-        "CREATE INDEX IF NOT EXISTS idx_raw_data_session_time ON raw_data(session_id, timestamp DESC);",
         "CREATE INDEX IF NOT EXISTS idx_step_metrics_user ON step_metrics(session_id, timestamp DESC);"
     ]
 
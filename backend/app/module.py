@@ -1,13 +1,25 @@
+import os
+import time
+import logging
 from fastapi import FastAPI, HTTPException, Depends, status
-from typing import List
+from typing import List, Dict
 import uvicorn
 from datetime import datetime, timedelta
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from data.tables import init_database
-from routers import auth_r
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from data.tables import init_database, get_db, engine, WalkingSessions, Users, SessionStatus
+from auth import get_current_user
+from data.db_settings import pool_metrics
+from routers import auth_r, progress
 from schemas import IMUSample
+from d_processing.online import OnlineGaitProcessor
+from d_processing.online_store import save_online_session
+from d_processing.dclass import Metadata
 from contextlib import asynccontextmanager 
+
+logger = logging.getLogger('LiveIngest')
 app = FastAPI(
     title="Gait Analysis API",
     version="1.0.0",
@@ -29,6 +41,7 @@ async def lifespan(app: FastAPI):
     yield
 
 app.include_router(auth_r.router)
+app.include_router(progress.router)
 
 @app.get("/")
 async def root():
@@ -39,15 +52,121 @@ async def root():
     }
 
 
+@app.get("/metrics/db-pool")
+async def db_pool_metrics():
+    return pool_metrics(engine)
+
+
+# session_id -> live processor, kept until the session is closed or goes idle
+online_sessions: Dict[int, OnlineGaitProcessor] = {}
+ONLINE_IDLE_SECONDS = float(os.getenv("ONLINE_IDLE_SECONDS", "300"))
+ONLINE_MAX_SESSIONS = int(os.getenv("ONLINE_MAX_SESSIONS", "100"))
+
+# The ORM mappers are not usable yet, so the live path queries the table
+walking_sessions = WalkingSessions.__table__
+
+async def evict_idle_processors(db: AsyncSession):
+    # A device that stops sending without closing is closed for it: its strides
+    # are flushed and saved like on /close. A processor whose save fails stays
+    # and is tried again on the next ingest.
+    cutoff = time.monotonic() - ONLINE_IDLE_SECONDS
+    for session_id in [sid for sid, p in online_sessions.items() if p.last_seen < cutoff]:
+        try:
+            await save_online_session(db, online_sessions[session_id])
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            logger.exception(f"Could not save idle live session {session_id}")
+            continue
+        del online_sessions[session_id]
+
+def check_owner(processor: OnlineGaitProcessor, user: Users):
+    if processor.metadata.user_id != user.id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
+
+async def get_online_processor(session_id: int, db: AsyncSession, user: Users) -> OnlineGaitProcessor:
+    processor = online_sessions.get(session_id)
+    if processor is not None:
+        check_owner(processor, user)
+        return processor
+
+    result = await db.execute(select(walking_sessions).where(walking_sessions.c.id == session_id))
+    session = result.one_or_none()
+    if not session:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found")
+    if session.user_id != user.id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
+    if session.status != SessionStatus.RECORDING:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Session is not in RECORDING status (current: {session.status.value})"
+        )
+    if len(online_sessions) >= ONLINE_MAX_SESSIONS:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many live sessions",
+            headers={"Retry-After": "30"}
+        )
+    processor = OnlineGaitProcessor(metadata=Metadata(
+        start_time=session.start_time,
+        height=None,
+        user_notes=session.notes,
+        is_baseline=session.is_baseline,
+        user_id=session.user_id,
+        session_id=session.id
+    ))
+    online_sessions[session_id] = processor
+    return processor
+
 @app.post('/ingest', status_code=200)
-async def ingest(sample: List[IMUSample]):
+async def ingest(
+    sample: List[IMUSample],
+    db: AsyncSession = Depends(get_db),
+    current_user: Users = Depends(get_current_user)
+):
     if not sample:
         raise HTTPException(status_code=400, detail="Sample is empty")
+    await evict_idle_processors(db)
+
+    by_session: Dict[int, List[IMUSample]] = {}
+    for s in sample:
+        by_session.setdefault(s.session_id, []).append(s)
+
+    # Rows are returned as strides become final; everything is written to
+    # step_metrics once, when the session is closed
+    steps = []
+    for session_id, samples in by_session.items():
+        processor = await get_online_processor(session_id, db, current_user)
+        steps += processor.push_samples(samples)
+
+    return {'received': len(sample), 'status' : 'success', 'step_metrics': steps}
+
+
+@app.post('/ingest/{session_id}/close', status_code=200)
+async def close_ingest(
+    session_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: Users = Depends(get_current_user)
+):
+    processor = online_sessions.get(session_id)
+    if processor is None:
+        raise HTTPException(status_code=404, detail="No live data for this session")
+    check_owner(processor, current_user)
+
+    # Steps, summary and rollups commit together; on failure the processor
+    # stays so the client can close again
+    try:
+        rows = await save_online_session(db, processor)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error on saving live session: {str(e)}"
+        )
+    del online_sessions[session_id]
 
-    thigh_count = sum(1 for s in sample if s.device_pos == 'thigh')
-    shin_count = sum(1 for s in sample if s.device_pos == 'shin')
-    print(f' shin_count: {shin_count}, thigh_count: {thigh_count}')
-    return {'received': len(sample), 'status' : 'success'}
+    return {'status': 'closed', 'samples': processor.n_samples, 'step_metrics': rows}
 
 
 if __name__ == "__main__":
@@ -0,0 +1,48 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from datetime import datetime
+from data.tables import get_db, Users, PeriodType
+from auth import get_current_user
+from schemas import ProgressPoint, ProgressSummary
+from d_processing.progress import get_user_progress, progress_summary, naive_utc
+
+# Trends come from the user_progress rollups the processing worker keeps up
+# to date, never from scanning step_metrics per request
+router = APIRouter(
+    prefix="/api/progress",
+    tags=["Progress"],
+    responses={
+        401: {"description": "Unauthorized"},
+        404: {"description": "Not found"}
+    }
+)
+
+@router.get("/", response_model=List[ProgressPoint])
+async def get_progress(
+    period: PeriodType = PeriodType.WEEK,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(12, ge=1, le=366),
+    current_user: Users = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    rows = await get_user_progress(db, current_user.id, period.value, start, end, limit)
+    # d_processing loads the tables as app.data.tables, so its PeriodType is a
+    # different class from this one; hand enums across by value
+    return [ProgressPoint(**{**row._mapping, 'period_type': row.period_type.value}) for row in rows]
+
+@router.get("/summary", response_model=ProgressSummary)
+async def get_progress_summary(
+    start: datetime,
+    end: datetime,
+    current_user: Users = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    start, end = naive_utc(start), naive_utc(end)
+    if end <= start:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="end must be after start"
+        )
+    return await progress_summary(db, current_user.id, start, end)
@@ -2,7 +2,7 @@ from pydantic import BaseModel, EmailStr, Field, field_validator, ConfigDict
 from typing import Optional, List, Literal, Dict, Any
 from datetime import datetime
 from enum import Enum
-from data.tables import GenderEnum, SideEnum, ActivityType, SessionStatus
+from data.tables import GenderEnum, SideEnum, ActivityType, SessionStatus, PeriodType
 
 class UserBase(BaseModel):
     is_doctor: bool =False
@@ -166,6 +166,13 @@ class UploadResponse(BaseModel):
     duration: float
     message: str = Field(default="Data uploaded successfully. Processing started in background.")
 
+class IMUSample(BaseModel):
+    session_id: int
+    device_pos: Literal['thigh', 'shin']
+    timestamp: float
+    acc: List[float] = Field(..., min_length=3, max_length=3, description="x, y, z (м/с²)")
+    gyro: List[float] = Field(..., min_length=3, max_length=3, description="x, y, z (град/сек)")
+
 class InjuryInfo(BaseModel):
     have_injury: bool = False
     body_part: List[str] = []
@@ -289,4 +296,27 @@ class ChatSessionResponse(BaseModel):
     is_active: bool
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class ProgressPoint(BaseModel):
+    period_type: PeriodType
+    period_start: datetime
+    session_count: int
+    step_count: int
+    total_duration: Optional[float] = None
+    avg_cadence: Optional[float] = None
+    avg_speed: Optional[float] = None
+    avg_gvi: Optional[float] = None
+    avg_knee_rom: Optional[float] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class ProgressSummary(BaseModel):
+    sessions: int
+    steps: int
+    active_days: int
+    avg_cadence: Optional[float] = None
+    avg_speed: Optional[float] = None
+    avg_gvi: Optional[float] = None
+    avg_knee_rom: Optional[float] = None
+    improvement: Optional[str] = None
@@ -0,0 +1,80 @@
+# Run from backend/: python -m benchmarks.madgwick_bench
+import time
+import numpy as np
+from app.d_processing.madgwick import MadgwickAHRS, MultiMadgwickAHRS
+
+FS = 125
+
+
+def synthetic_imu(n_samples: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(n_samples) / FS
+    gyro = np.stack([
+        np.deg2rad(200 * np.sin(2 * np.pi * 1.0 * t)),
+        np.deg2rad(30 * np.sin(2 * np.pi * 2.0 * t)),
+        np.deg2rad(10 * np.cos(2 * np.pi * 0.5 * t)),
+    ], axis=1) + rng.normal(0, 0.01, (n_samples, 3))
+    acc = np.array([0.0, 0.0, 9.81]) + rng.normal(0, 0.5, (n_samples, 3))
+    return gyro.astype(np.float32), acc.astype(np.float32)
+
+
+def per_sample(gyro, acc):
+    ahrs = MadgwickAHRS(sampleperiod=1 / FS, beta=0.1)
+    out = np.empty((len(gyro), 4))
+    for i in range(len(gyro)):
+        ahrs.update_imu(gyro[i], acc[i])
+        out[i] = ahrs.quaternion.q
+    return out
+
+
+def batch(gyro, acc):
+    ahrs = MadgwickAHRS(sampleperiod=1 / FS, beta=0.1)
+    return ahrs.run_imu(gyro, acc)
+
+
+def multi_stream(gyros, accs):
+    ahrs = MultiMadgwickAHRS(len(gyros), sampleperiod=1 / FS, beta=0.1)
+    return ahrs.run_imu(gyros, accs)
+
+
+def main(seconds: float = 60.0, n_streams: int = 128):
+    n = int(seconds * FS)
+    gyro, acc = synthetic_imu(n)
+
+    t0 = time.perf_counter()
+    ref = per_sample(gyro, acc)
+    t_ref = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    fast = batch(gyro, acc)
+    t_fast = time.perf_counter() - t0
+
+    print(f"samples:      {n}")
+    print(f"update_imu:   {t_ref:.3f} s ({t_ref / n * 1e6:.2f} us/sample)")
+    print(f"run_imu:      {t_fast:.3f} s ({t_fast / n * 1e6:.2f} us/sample)")
+    print(f"speedup:      {t_ref / t_fast:.1f}x")
+    print(f"max |dq|:     {np.max(np.abs(ref - fast)):.3e}")
+
+    # Uneven session lengths, two sensors per session
+    streams = [synthetic_imu(int(n * (0.5 + 0.5 * k / n_streams)), seed=k) for k in range(n_streams)]
+    gyros = [g for g, _ in streams]
+    accs = [a for _, a in streams]
+    total = sum(len(g) for g in gyros)
+
+    t0 = time.perf_counter()
+    refs = [batch(g, a) for g, a in streams]
+    t_loop = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    multi = multi_stream(gyros, accs)
+    t_multi = time.perf_counter() - t0
+
+    print(f"streams:      {n_streams} ({total} samples)")
+    print(f"run_imu x K:  {t_loop:.3f} s")
+    print(f"multi-stream: {t_multi:.3f} s")
+    print(f"speedup:      {t_loop / t_multi:.1f}x")
+    print(f"max |dq|:     {max(np.max(np.abs(r - m)) for r, m in zip(refs, multi)):.3e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# Run from backend/: python -m benchmarks.quaternion_bench
+import time
+import tracemalloc
+import numpy as np
+from numpy.linalg import norm
+from app.d_processing.madgwick import MadgwickAHRS
+from app.d_processing.quaternion import Quaternion, FastQuaternion
+from benchmarks.madgwick_bench import synthetic_imu, FS
+
+
+class LegacyMadgwickAHRS:
+    """update_imu as it was before MadgwickAHRS switched to FastQuaternion."""
+
+    def __init__(self, sampleperiod=1 / FS, beta=0.1):
+        self.samplePeriod = sampleperiod
+        self.beta = beta
+        self.quaternion = Quaternion(1, 0, 0, 0)
+
+    def update_imu(self, gyroscope, accelerometer):
+        q = self.quaternion
+        gyroscope = np.array(gyroscope, dtype=float).flatten()
+        accelerometer = np.array(accelerometer, dtype=float).flatten()
+        accelerometer /= norm(accelerometer)
+        f = np.array([
+            2*(q[1]*q[3] - q[0]*q[2]) - accelerometer[0],
+            2*(q[0]*q[1] + q[2]*q[3]) - accelerometer[1],
+            2*(0.5 - q[1]**2 - q[2]**2) - accelerometer[2]
+        ])
+        j = np.array([
+            [-2*q[2], 2*q[3], -2*q[0], 2*q[1]],
+            [2*q[1], 2*q[0], 2*q[3], 2*q[2]],
+            [0, -4*q[1], -4*q[2], 0]
+        ])
+        step = j.T.dot(f)
+        step /= norm(step)
+        qdot = (q * Quaternion(0, gyroscope[0], gyroscope[1], gyroscope[2])) * 0.5 - self.beta * step.T
+        q += qdot * self.samplePeriod
+        self.quaternion = Quaternion(q / norm(q))
+
+
+def count_quaternions(cls, fn):
+    created = [0]
+    original_init = cls.__init__
+
+    def counting_init(self, *args, **kwargs):
+        created[0] += 1
+        original_init(self, *args, **kwargs)
+
+    cls.__init__ = counting_init
+    try:
+        fn()
+    finally:
+        cls.__init__ = original_init
+    return created[0]
+
+
+def profile(ahrs, quaternion_cls, gyro, acc):
+    n = len(gyro)
+
+    def run():
+        for i in range(n):
+            ahrs.update_imu(gyro[i], acc[i])
+
+    created = count_quaternions(quaternion_cls, run)
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    base, _ = tracemalloc.get_traced_memory()
+    ahrs.update_imu(gyro[0], acc[0])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    t0 = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - t0
+    return created / n, peak - base, elapsed / n * 1e6
+
+
+def main(n_samples: int = 5000):
+    gyro, acc = synthetic_imu(n_samples)
+
+    legacy = LegacyMadgwickAHRS()
+    current = MadgwickAHRS(sampleperiod=1 / FS, beta=0.1)
+
+    print(f"{'':10}{'quats/update':>14}{'peak bytes':>12}{'us/update':>11}")
+    for name, ahrs, cls in (("before", legacy, Quaternion), ("after", current, FastQuaternion)):
+        quats, peak, us = profile(ahrs, cls, gyro, acc)
+        print(f"{name:10}{quats:>14.1f}{peak:>12d}{us:>11.2f}")
+
+    print(f"max |dq|: {np.max(np.abs(legacy.quaternion.q - current.quaternion.q)):.3e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+# Run from backend/: python -m pytest tests
+# The database tests use a throwaway SQLite file (sqlite+aiosqlite) in place of Postgres.
+import os
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///" + os.path.join(tempfile.gettempdir(), "gait_tests.db"))
+os.environ.setdefault("RAW_STORAGE", os.path.join(tempfile.gettempdir(), "gait_tests_raw"))
+
+import pytest
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+
+
+@compiles(JSONB, 'sqlite')
+def _jsonb_on_sqlite(type_, compiler, **kw):
+    return "JSON"
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return tmp_path / "app.db"
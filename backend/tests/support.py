@@ -0,0 +1,97 @@
+# Shared setup for the tests: a SQLite schema and synthetic recordings
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from app.data import tables
+from app.d_processing.unpacking import BIN_DTYPE
+
+DB_TABLES = [
+    tables.Users.__table__,
+    tables.Profiles.__table__,
+    tables.WalkingSessions.__table__,
+    tables.ProcessingJobs.__table__,
+    tables.StepMetrics.__table__,
+    tables.UserProgress.__table__,
+]
+
+
+async def open_database(path, users=(1,)):
+    # Fresh schema in a SQLite file with a user and profile per id
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(lambda sync: tables.Base.metadata.create_all(sync, tables=DB_TABLES))
+        for user_id in users:
+            await conn.execute(insert(tables.Users.__table__).values(
+                id=user_id, name=f"user {user_id}", email=f"user{user_id}@example.com",
+                password="x", created_at=datetime(2026, 1, 1)
+            ))
+            await conn.execute(insert(tables.Profiles.__table__).values(
+                id=user_id, age=30, gender=tables.GenderEnum.MALE, weight=70, height=175,
+                shoe_size=42, leg_length=90, created_at=datetime(2026, 1, 1)
+            ))
+    return engine, async_sessionmaker(engine, expire_on_commit=False)
+
+
+async def add_session(db, session_id, user_id=1, start_time=datetime(2026, 3, 2, 9),
+                      status=tables.SessionStatus.PROCESSING):
+    await db.execute(insert(tables.WalkingSessions.__table__).values(
+        id=session_id, user_id=user_id, start_time=start_time, status=status,
+        activity_type=[], is_processed=False, is_baseline=False
+    ))
+
+
+def synthetic_recording(seconds=60, fs=125, seed=0) -> np.ndarray:
+    # Walking-like thigh/shin signal: 0.9 Hz gait with noise
+    rng = np.random.default_rng(seed)
+    n = int(seconds * fs)
+    t = np.arange(n) / fs
+    phase = 2 * np.pi * 0.9 * t
+    data = np.zeros(n, BIN_DTYPE)
+    data['timestamp'] = t
+    data['gyro2'][:, 1] = 250 * np.sin(phase) + 80 * np.sin(2 * phase) + rng.normal(0, 3, n)
+    data['gyro1'][:, 1] = 120 * np.sin(phase - 0.5) + rng.normal(0, 3, n)
+    data['acc2'][:, 2] = 9.81 + 3 * np.sin(2 * phase) + rng.normal(0, 0.3, n)
+    data['acc1'][:, 2] = 9.81 + 1.5 * np.sin(2 * phase) + rng.normal(0, 0.3, n)
+    return data
+
+
+class IdentityCalibrator:
+    # No device calibration file exists in tests
+    def load(self, device_id):
+        pass
+
+    def align_to_gravity(self, data):
+        pass
+
+    def apply(self, data):
+        return np.array(data, copy=True)
+
+
+def orchestrator():
+    from app.d_processing.raw_process import GaitAnalysisOrchestrator
+    from app.d_processing.lowp_f import prefiltration
+    from app.d_processing import session_pro
+    return GaitAnalysisOrchestrator(
+        unpack_bin=None,
+        calibrator=IdentityCalibrator(),
+        prefiltration=prefiltration,
+        session=session_pro
+    )
+
+
+def metadata(session_id=1, user_id=1, start_time=datetime(2026, 3, 2, 9)):
+    from app.d_processing.dclass import Metadata
+    return Metadata(start_time=start_time, height=175, session_id=session_id, user_id=user_id)
+
+
+def processed(session_id=1, user_id=1, start_time=datetime(2026, 3, 2, 9), seconds=60, seed=0):
+    # (summary, step_metrics records) the pool returns for a synthetic session
+    from app.d_processing.step_pro import step_metrics_records
+    engine = orchestrator()
+    meta = metadata(session_id, user_id, start_time)
+    summary = engine.process_session(synthetic_recording(seconds, seed=seed), meta)
+    table, knee_curves = engine.step_metrics
+    return summary, step_metrics_records(table, knee_curves, session_id, start_time, engine.sampling_rate)
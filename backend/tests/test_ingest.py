@@ -0,0 +1,124 @@
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+
+pytest.importorskip("fastapi")
+from fastapi.testclient import TestClient
+
+# module.py is the API entry point and imports its packages from backend/app
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+import module  # noqa: E402
+
+from app.data.tables import SessionStatus, WalkingSessions, StepMetrics, UserProgress  # noqa: E402
+from .support import open_database, add_session, synthetic_recording  # noqa: E402
+
+sessions = WalkingSessions.__table__
+
+
+def _payload(session_id, records):
+    samples = []
+    for r in records:
+        for pos, acc, gyro in (('thigh', 'acc1', 'gyro1'), ('shin', 'acc2', 'gyro2')):
+            samples.append({
+                'session_id': session_id, 'device_pos': pos, 'timestamp': float(r['timestamp']),
+                'acc': [float(v) for v in r[acc]], 'gyro': [float(v) for v in r[gyro]],
+            })
+    return samples
+
+
+@pytest.fixture
+def api(db_path, monkeypatch):
+    async def setup():
+        engine, factory = await open_database(db_path, users=(1, 2))
+        async with factory() as db:
+            await add_session(db, 1, user_id=1, status=SessionStatus.RECORDING)
+            await add_session(db, 2, user_id=1, status=SessionStatus.RECORDING)
+            await add_session(db, 3, user_id=2, status=SessionStatus.RECORDING)
+            await db.commit()
+        await engine.dispose()
+    asyncio.run(setup())
+
+    # Fresh connections per request: the test client runs its own event loop
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", poolclass=NullPool)
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def get_db():
+        async with factory() as db:
+            yield db
+
+    user = SimpleNamespace(id=1)
+    module.app.dependency_overrides[module.get_db] = get_db
+    module.app.dependency_overrides[module.get_current_user] = lambda: user
+    monkeypatch.setattr(module, 'online_sessions', {})
+    with TestClient(module.app) as client:
+        yield SimpleNamespace(client=client, user=user, factory=factory)
+    module.app.dependency_overrides.clear()
+
+
+def _query(api, statement):
+    async def run():
+        async with api.factory() as db:
+            return (await db.execute(statement)).all()
+    return asyncio.run(run())
+
+
+def test_ingest_rejects_sessions_of_other_users(api):
+    records = synthetic_recording(1)
+    assert api.client.post('/ingest', json=_payload(3, records)).status_code == 403
+    assert api.client.post('/ingest', json=_payload(1, records)).status_code == 200
+
+    api.user.id = 2
+    assert api.client.post('/ingest', json=_payload(1, records)).status_code == 403
+    assert api.client.post('/ingest/1/close').status_code == 403
+    assert 1 in module.online_sessions
+
+
+def test_ingest_limits_live_sessions(api, monkeypatch):
+    monkeypatch.setattr(module, 'ONLINE_MAX_SESSIONS', 1)
+    records = synthetic_recording(1)
+    assert api.client.post('/ingest', json=_payload(1, records)).status_code == 200
+    response = api.client.post('/ingest', json=_payload(2, records))
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '30'
+
+
+def test_close_saves_steps_summary_and_rollups(api):
+    records = synthetic_recording(60)
+    emitted = []
+    for start in range(0, len(records), 625):
+        response = api.client.post('/ingest', json=_payload(1, records[start:start + 625]))
+        emitted += response.json()['step_metrics']
+    response = api.client.post('/ingest/1/close')
+    assert response.status_code == 200
+    emitted += response.json()['step_metrics']
+    assert 1 not in module.online_sessions
+
+    session = _query(api, select(sessions).where(sessions.c.id == 1))[0]
+    steps = _query(api, select(func.count()).select_from(StepMetrics.__table__))[0][0]
+    progress = _query(api, select(UserProgress.__table__))
+    assert (session.status, session.is_processed) == (SessionStatus.COMPLETED, True)
+    assert steps == len(emitted) > 0
+    # The summary leaves out strides rejected as artifacts
+    assert 0 < session.step_count <= steps
+    assert len(progress) == 2
+
+    # A completed session takes no more live data
+    assert api.client.post('/ingest', json=_payload(1, records[:125])).status_code == 400
+
+
+def test_idle_sessions_are_saved_before_eviction(api):
+    records = synthetic_recording(30)
+    assert api.client.post('/ingest', json=_payload(1, records)).status_code == 200
+    module.online_sessions[1].last_seen = time.monotonic() - module.ONLINE_IDLE_SECONDS - 1
+
+    assert api.client.post('/ingest', json=_payload(2, records[:125])).status_code == 200
+    assert list(module.online_sessions) == [2]
+    session = _query(api, select(sessions).where(sessions.c.id == 1))[0]
+    assert session.status == SessionStatus.COMPLETED and session.step_count > 0
@@ -0,0 +1,106 @@
+import asyncio
+
+from sqlalchemy import select, update
+
+from app.data.tables import JobStatus, SessionStatus, ProcessingJobs, WalkingSessions
+from app.d_processing.jobs import JobQueue
+from .support import open_database, add_session
+
+jobs = ProcessingJobs.__table__
+sessions = WalkingSessions.__table__
+
+
+async def _queue(db_path, n_sessions=3, **kwargs):
+    engine, factory = await open_database(db_path)
+    queue = JobQueue(factory, **kwargs)
+    async with factory() as db:
+        for session_id in range(1, n_sessions + 1):
+            await add_session(db, session_id)
+            await queue.enqueue(db, session_id, f"session_{session_id}.imu")
+        await db.commit()
+    return engine, factory, queue
+
+
+async def _session_status(factory, session_id):
+    async with factory() as db:
+        return (await db.execute(select(sessions.c.status).where(sessions.c.id == session_id))).scalar_one()
+
+
+async def _expire_leases(factory):
+    async with factory() as db:
+        await db.execute(update(jobs).values(lease_expires_at=JobQueue._now().replace(year=2000)))
+        await db.commit()
+
+
+def test_concurrent_claims_never_share_a_job(db_path):
+    async def run():
+        engine, factory, queue = await _queue(db_path)
+        claimed = await asyncio.gather(*(queue.claim(f"worker-{i}") for i in range(6)))
+        ids = [job.id for job in claimed if job is not None]
+        assert sorted(ids) == [1, 2, 3]
+        assert await queue.claim("late") is None
+        assert await queue.depth() == 3
+        await engine.dispose()
+
+    asyncio.run(run())
+
+
+def test_heartbeat_only_renews_own_lease(db_path):
+    async def run():
+        engine, factory, queue = await _queue(db_path, n_sessions=1)
+        job = await queue.claim("a")
+        assert await queue.heartbeat(job.id, "a")
+        assert not await queue.heartbeat(job.id, "b")
+        assert not await queue.complete(job.id, "b")
+        assert await queue.complete(job.id, "a")
+        assert await queue.depth() == 0
+        await engine.dispose()
+
+    asyncio.run(run())
+
+
+def test_expired_lease_is_reclaimed_until_attempts_run_out(db_path):
+    async def run():
+        engine, factory, queue = await _queue(db_path, n_sessions=1, max_attempts=2)
+        first = await queue.claim("a")
+        await _expire_leases(factory)
+
+        second = await queue.claim("b")
+        assert (second.id, second.attempts, second.lease_owner) == (first.id, 2, "b")
+        # The crashed worker can no longer finish the job
+        assert not await queue.complete(first.id, "a")
+
+        await _expire_leases(factory)
+        assert await queue.claim("c") is None
+        async with factory() as db:
+            job = (await db.execute(select(jobs).where(jobs.c.id == first.id))).one()
+        assert (job.status, job.last_error) == (JobStatus.FAILED, "Lease expired")
+        assert await _session_status(factory, 1) == SessionStatus.STOPPED
+        await engine.dispose()
+
+    asyncio.run(run())
+
+
+def test_failures_retry_with_backoff_then_stop_the_session(db_path):
+    async def run():
+        engine, factory, queue = await _queue(db_path, n_sessions=1, retry_delay=3600, max_attempts=3)
+        job = await queue.claim("a")
+        assert await queue.fail(job.id, "a", "boom")
+        # Back in the queue, but not before the retry delay
+        assert await queue.claim("a") is None
+        assert await _session_status(factory, 1) == SessionStatus.PROCESSING
+
+        async with factory() as db:
+            await db.execute(update(jobs).values(run_after=JobQueue._now()))
+            await db.commit()
+        job = await queue.claim("a")
+        assert job.attempts == 2
+        assert await queue.fail(job.id, "a", "bad data", retry=False)
+
+        async with factory() as db:
+            row = (await db.execute(select(jobs).where(jobs.c.id == job.id))).one()
+        assert (row.status, row.last_error) == (JobStatus.FAILED, "bad data")
+        assert await _session_status(factory, 1) == SessionStatus.STOPPED
+        await engine.dispose()
+
+    asyncio.run(run())
@@ -0,0 +1,57 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.d_processing.online import OnlineGaitProcessor
+from .support import metadata, orchestrator, synthetic_recording
+
+FS = 125
+
+
+def _samples(records, device_pos):
+    acc, gyro = ('acc1', 'gyro1') if device_pos == 'thigh' else ('acc2', 'gyro2')
+    return [
+        SimpleNamespace(device_pos=device_pos, timestamp=float(r['timestamp']), acc=list(r[acc]), gyro=list(r[gyro]))
+        for r in records
+    ]
+
+
+def test_unpaired_stream_is_capped():
+    processor = OnlineGaitProcessor(metadata=metadata(), max_unpaired_seconds=2.0)
+    records = synthetic_recording(10)
+    assert processor.push_samples(_samples(records, 'thigh')) == []
+    assert len(processor._pending['thigh']) == 250
+    assert processor.dropped == len(records) - 250
+
+    # A trickle from the partner does not let the backlog grow again
+    processor.push_samples(_samples(records[:1], 'shin') + _samples(records, 'thigh'))
+    assert len(processor._pending['thigh']) == 250
+    assert processor.n_samples == 1
+
+
+def test_live_steps_match_batch_processing():
+    recording = synthetic_recording(120)
+    engine = orchestrator()
+    assert engine.process_session(recording, metadata())
+    batch, _ = engine.step_metrics
+    stride = np.median(np.diff(batch['hs_idx'])) / FS
+
+    # One second of both sensors per request, as a device would send them
+    processor = OnlineGaitProcessor(metadata=metadata())
+    rows, latencies = [], []
+    for start in range(0, len(recording), FS):
+        chunk = recording[start:start + FS]
+        emitted = processor.push_samples(_samples(chunk, 'thigh') + _samples(chunk, 'shin'))
+        rows += emitted
+        latencies += [((start + len(chunk)) - r['hs_idx']) / FS for r in emitted if r['hs_idx'] > 5 * FS]
+    rows += processor.flush()
+
+    assert abs(len(rows) - len(batch)) <= 2
+    assert [r['step_number'] for r in rows] == list(range(1, len(rows) + 1))
+    step_times = np.array([r['step_time'] for r in rows])
+    assert abs(step_times.mean() - batch['step_time'].mean()) < 0.01 * batch['step_time'].mean()
+
+    # Past the first seconds of warm-up a stride is released within about two
+    # strides of its heel strike, plus the one-second batching
+    assert latencies and max(latencies) <= 2 * stride + 1.0
+    assert 0 < processor.summary()['step_count'] <= len(rows)
@@ -0,0 +1,58 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import update
+
+from app.data.tables import PeriodType, SessionStatus, WalkingSessions
+from app.d_processing.progress import period_bounds, refresh_user_progress, get_user_progress, progress_summary
+from .support import open_database, add_session
+
+sessions = WalkingSessions.__table__
+
+
+def test_period_bounds_convert_aware_times_to_utc():
+    moment = datetime(2026, 3, 8, 22, 30, tzinfo=timezone(timedelta(hours=-5)))
+    assert period_bounds(moment, PeriodType.DAY) == (datetime(2026, 3, 9), datetime(2026, 3, 10))
+    assert period_bounds(moment, PeriodType.WEEK) == (datetime(2026, 3, 9), datetime(2026, 3, 16))
+
+
+def test_rollups_follow_completed_sessions(db_path):
+    starts = [datetime(2026, 3, 2, 9), datetime(2026, 3, 2, 18), datetime(2026, 3, 10, 9)]
+
+    async def run():
+        engine, factory = await open_database(db_path)
+        async with factory() as db:
+            for session_id, (start, cadence) in enumerate(zip(starts, [100.0, 110.0, 120.0]), 1):
+                await add_session(db, session_id, start_time=start, status=SessionStatus.COMPLETED)
+                await db.execute(update(sessions).where(sessions.c.id == session_id).values(
+                    step_count=100 * session_id, cadence=cadence, avg_speed=1.0, gvi=5.0, duration=60.0
+                ))
+                # Refreshing twice must not double count
+                await refresh_user_progress(db, 1, start)
+                await refresh_user_progress(db, 1, start)
+            await db.commit()
+
+            day = (await get_user_progress(db, 1, PeriodType.DAY, limit=1))[0]
+            assert (day.period_start, day.session_count, day.step_count) == (datetime(2026, 3, 10), 1, 300)
+            first_week = (await get_user_progress(db, 1, 'week'))[-1]
+            assert (first_week.session_count, first_week.step_count) == (2, 300)
+            assert first_week.avg_cadence == round((100 * 100 + 110 * 200) / 300, 2)
+
+            # Bounds given in another zone select the same UTC rows
+            aware = datetime(2026, 3, 10, 3, tzinfo=timezone(timedelta(hours=3)))
+            assert len(await get_user_progress(db, 1, PeriodType.DAY, start=aware)) == 1
+
+            summary = await progress_summary(
+                db, 1, datetime(2026, 3, 1, tzinfo=timezone.utc), datetime(2026, 4, 1, tzinfo=timezone.utc)
+            )
+            assert (summary['sessions'], summary['steps'], summary['active_days']) == (3, 600, 2)
+            assert summary['improvement'] == f"{100 * (120 - first_week.avg_cadence) / first_week.avg_cadence:+.1f}%"
+
+            # A session that leaves COMPLETED drops out
+            await db.execute(update(sessions).where(sessions.c.id == 3).values(status=SessionStatus.STOPPED))
+            await refresh_user_progress(db, 1, starts[2])
+            await db.commit()
+            assert len(await get_user_progress(db, 1, PeriodType.WEEK)) == 1
+        await engine.dispose()
+
+    asyncio.run(run())
@@ -0,0 +1,53 @@
+import asyncio
+
+from sqlalchemy import select, func
+
+from app.data.tables import StepMetrics
+from app.d_processing.step_store import write_step_metrics
+from .support import open_database, add_session, processed
+
+step_metrics = StepMetrics.__table__
+
+
+async def _count(db, session_id):
+    return (await db.execute(
+        select(func.count()).select_from(step_metrics).where(step_metrics.c.session_id == session_id)
+    )).scalar_one()
+
+
+def test_write_step_metrics_sqlite(db_path):
+    _, records = processed(session_id=1)
+    _, other = processed(session_id=2, seed=1)
+    assert len(records) > 20
+
+    async def run():
+        engine, sessions = await open_database(db_path)
+        async with sessions() as db:
+            await add_session(db, 1)
+            await add_session(db, 2)
+            assert await write_step_metrics(db, 1, records, batch_size=7) == len(records)
+            await write_step_metrics(db, 2, other[:5])
+            await db.commit()
+
+        async with sessions() as db:
+            rows = (await db.execute(
+                select(step_metrics).where(step_metrics.c.session_id == 1).order_by(step_metrics.c.step_number)
+            )).all()
+            assert len(rows) == len(records)
+            assert rows[0].timestamp == records[0][1]
+            assert len(rows[0].knee_curve_json) == 100
+            ids = (await db.execute(select(step_metrics.c.id))).scalars().all()
+            assert len(set(ids)) == len(records) + 5
+
+            # Rewriting replaces the session's rows, and a rollback keeps the old ones
+            await write_step_metrics(db, 1, records[:3])
+            await db.rollback()
+        async with sessions() as db:
+            assert await _count(db, 1) == len(records)
+            await write_step_metrics(db, 1, records[:3])
+            await db.commit()
+            assert await _count(db, 1) == 3
+            assert await _count(db, 2) == 5
+        await engine.dispose()
+
+    asyncio.run(run())
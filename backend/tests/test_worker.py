@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select, func, update
+
+from app.data.tables import JobStatus, SessionStatus, ProcessingJobs, WalkingSessions, StepMetrics, UserProgress
+from app.d_processing import pool
+from app.d_processing.jobs import JobQueue
+from app.d_processing.raw_store import save_raw
+from app.d_processing.worker import SessionWorker
+from .support import open_database, add_session, orchestrator, synthetic_recording
+
+jobs = ProcessingJobs.__table__
+sessions = WalkingSessions.__table__
+
+
+class InlinePool:
+    # ProcessingPool's interface, running pool._process_session in a thread
+    max_workers = 1
+
+    async def submit(self, session_id, raw_data, metadata, device_id=None, with_steps=False):
+        return await asyncio.to_thread(pool._process_session, raw_data, metadata, device_id, with_steps)
+
+
+@pytest.fixture
+def inline_pool(monkeypatch):
+    monkeypatch.setattr(pool, '_orchestrator', orchestrator())
+    return InlinePool()
+
+
+async def _run_worker(db_path, raw_path, inline_pool, **queue_args):
+    engine, factory = await open_database(db_path)
+    queue = JobQueue(factory, **queue_args)
+    async with factory() as db:
+        await add_session(db, 1)
+        await queue.enqueue(db, 1, raw_path)
+        await db.commit()
+    await SessionWorker(queue, inline_pool, factory, worker_id="test", poll_interval=0.05).run(once=True)
+    return engine, factory
+
+
+def test_worker_processes_a_session_end_to_end(db_path, tmp_path, inline_pool):
+    raw_path = save_raw(1, synthetic_recording(90).tobytes(), storage=str(tmp_path / "raw"))
+
+    async def run():
+        engine, factory = await _run_worker(db_path, raw_path, inline_pool)
+        async with factory() as db:
+            job = (await db.execute(select(jobs))).one()
+            session = (await db.execute(select(sessions).where(sessions.c.id == 1))).one()
+            steps = (await db.execute(select(func.count()).select_from(StepMetrics.__table__))).scalar_one()
+            progress = (await db.execute(select(UserProgress.__table__))).all()
+        assert job.status == JobStatus.DONE
+        assert (session.status, session.is_processed) == (SessionStatus.COMPLETED, True)
+        assert session.step_count > 0 and steps > 0
+        assert sorted(p.period_type.value for p in progress) == ['day', 'week']
+        assert all(p.session_count == 1 and p.step_count == session.step_count for p in progress)
+        await engine.dispose()
+
+    asyncio.run(run())
+
+
+def test_worker_stops_the_session_when_retries_run_out(db_path, tmp_path, inline_pool):
+    async def run():
+        engine, factory = await _run_worker(
+            db_path, str(tmp_path / "missing.imu"), inline_pool, retry_delay=0, max_attempts=2
+        )
+        async with factory() as db:
+            job = (await db.execute(select(jobs))).one()
+            status = (await db.execute(select(sessions.c.status).where(sessions.c.id == 1))).scalar_one()
+        assert (job.status, job.attempts) == (JobStatus.FAILED, 2)
+        assert "FileNotFoundError" in job.last_error
+        assert status == SessionStatus.STOPPED
+        await engine.dispose()
+
+    asyncio.run(run())
+
+
+class StolenLeasePool(InlinePool):
+    # Another worker reclaims the job while this one is still processing it
+    def __init__(self, factory):
+        self.factory = factory
+
+    async def submit(self, session_id, raw_data, metadata, device_id=None, with_steps=False):
+        result = await super().submit(session_id, raw_data, metadata, device_id, with_steps)
+        async with self.factory() as db:
+            await db.execute(update(jobs).values(lease_owner="other", attempts=2))
+            await db.commit()
+        return result
+
+
+def test_worker_discards_result_after_losing_the_lease(db_path, tmp_path, inline_pool):
+    raw_path = save_raw(1, synthetic_recording(60).tobytes(), storage=str(tmp_path / "raw"))
+
+    async def run():
+        engine, factory = await open_database(db_path)
+        queue = JobQueue(factory)
+        async with factory() as db:
+            await add_session(db, 1)
+            await queue.enqueue(db, 1, raw_path)
+            await db.commit()
+        job = await queue.claim("test")
+        await SessionWorker(queue, StolenLeasePool(factory), factory, worker_id="test").handle(job)
+
+        async with factory() as db:
+            job = (await db.execute(select(jobs))).one()
+            session = (await db.execute(select(sessions).where(sessions.c.id == 1))).one()
+            steps = (await db.execute(select(func.count()).select_from(StepMetrics.__table__))).scalar_one()
+            progress = (await db.execute(select(UserProgress.__table__))).all()
+        assert (job.status, job.lease_owner) == (JobStatus.RUNNING, "other")
+        assert (session.status, session.step_count) == (SessionStatus.PROCESSING, None)
+        assert steps == 0 and progress == []
+        await engine.dispose()
+
+    asyncio.run(run())
+
+
+def test_heartbeat_survives_errors_and_reports_a_lost_lease():
+    class FlakyQueue:
+        lease_seconds = 0.03
+
+        def __init__(self):
+            self.calls = 0
+
+        async def heartbeat(self, job_id, worker_id):
+            self.calls += 1
+            if self.calls == 1:
+                raise ConnectionError("database went away")
+            return self.calls < 3
+
+    async def run():
+        queue = FlakyQueue()
+        lost = asyncio.Event()
+        worker = SessionWorker(queue, InlinePool(), None, worker_id="test")
+        await asyncio.wait_for(worker._keep_lease(1, lost), timeout=5)
+        assert lost.is_set() and queue.calls == 3
+
+    asyncio.run(run())